@@ -0,0 +1,4 @@
+"""
+Benchmarks for sqlalchemy_dremio. They do not need a live Dremio and are run
+as modules from the repository root, e.g. `python -m benchmarks.bench_params`.
+"""
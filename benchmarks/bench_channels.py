@@ -0,0 +1,56 @@
+"""
+Measure aggregate `do_get` throughput with K = 1..8 Flight channels per
+connection (the `Channels` connection property) against the stand-in
+serving a result split over several endpoints:
+
+    python -m benchmarks.bench_channels
+    python -m benchmarks.bench_channels --rows 8000000 --endpoints 16 --channels 1 2 4
+
+Only the transfer phase is timed (`QueryStats.do_get_ms`), so conversion to
+Python rows does not hide the network.
+"""
+import argparse
+
+from benchmarks.flight_server import ServerProcess, dataset_query
+
+
+def run(port, sql, channels, repeat):
+    from sqlalchemy_dremio.db import Connection
+
+    connection = Connection('HOST=localhost;PORT={0};Token=benchmark;UseEncryption=false;Channels={1}'.format(
+        port, channels))
+    best = None
+    for _ in range(repeat):
+        cursor = connection.execute(sql)
+        stats = cursor.stats
+        mb_per_s = stats.bytes / (1024.0 * 1024.0) / (stats.do_get_ms / 1000.0)
+        best = mb_per_s if best is None else max(best, mb_per_s)
+        cursor.close()
+    connection.close()
+    return stats.bytes, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=4000000)
+    parser.add_argument('--endpoints', type=int, default=8)
+    parser.add_argument('--dataset', default='narrow_numeric', help='<shape>_<kind> of the synthetic result')
+    parser.add_argument('--channels', type=int, nargs='+', default=list(range(1, 9)))
+    parser.add_argument('--repeat', type=int, default=3, help='runs per K; the best is reported')
+    parser.add_argument('--compression', choices=('lz4', 'zstd'))
+    args = parser.parse_args()
+
+    shape, kind = args.dataset.split('_')
+    sql = dataset_query(shape, kind, args.rows, args.endpoints)
+    print('{0:>8} {1:>12} {2:>10} {3:>10}'.format('channels', 'MB', 'MB/s', 'speedup'))
+    with ServerProcess(compression=args.compression) as port:
+        baseline = None
+        for channels in args.channels:
+            size, mb_per_s = run(port, sql, channels, args.repeat)
+            baseline = baseline or mb_per_s
+            print('{0:>8} {1:>12.1f} {2:>10.1f} {3:>9.2f}x'.format(
+                channels, size / (1024.0 * 1024.0), mb_per_s, mb_per_s / baseline))
+
+
+if __name__ == '__main__':
+    main()
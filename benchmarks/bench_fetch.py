@@ -0,0 +1,191 @@
+"""
+Measure the client's own overhead on the full `create_engine('dremio+flight://...')`
+path against the in-process Flight stand-in: connect, execute, and
+fetchone/fetchmany/fetchall loops, the first column only (`Result.scalars()`),
+`yield_per` partitions streamed from a server-side cursor, or a pandas
+DataFrame fetch.
+
+Every case runs in a fresh interpreter so its peak RSS is its own. Results
+are printed as rows/sec and peak RSS and saved as JSON, so runs can be
+compared for regressions:
+
+    python -m benchmarks.bench_fetch
+    python -m benchmarks.bench_fetch --full --save
+    python -m benchmarks.bench_fetch --compare .benchmarks/fetch-<earlier run>.json
+"""
+import argparse
+import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.flight_server import ServerProcess, connection_url, dataset_query
+
+RESULTS_DIR = '.benchmarks'
+
+FETCH_MODES = ('fetchone', 'fetchmany', 'fetchall', 'scalars', 'stream', 'dataframe')
+
+
+def _datasets(full):
+    rows = [1000, 100000, 1000000] + ([10000000, 50000000] if full else [])
+    datasets = []
+    for count in rows:
+        for shape, kind in (('narrow', 'numeric'), ('narrow', 'string'), ('narrow', 'category'), ('wide', 'numeric'),
+                            ('wide', 'mixed')):
+            # Wide results of tens of millions of rows do not fit a workstation.
+            if shape == 'wide' and count > 1000000:
+                continue
+            datasets.append((shape, kind, count, 4 if count >= 1000000 else 1))
+    return datasets
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+def run_case(port, shape, kind, rows, endpoints, mode, fetch_size):
+    """Run one case in this process and return its measurements."""
+    from sqlalchemy import create_engine, text
+
+    sql = dataset_query(shape, kind, rows, endpoints)
+    engine = create_engine(connection_url(port))
+
+    start = time.perf_counter()
+    connection = engine.connect()
+    connected = time.perf_counter()
+
+    fetched = 0
+    if mode == 'dataframe':
+        import pandas as pd
+        fetched = len(pd.read_sql(text(sql), connection))
+        executed = connected
+    elif mode == 'stream':
+        result = connection.execution_options(yield_per=fetch_size).execute(text(sql))
+        executed = time.perf_counter()
+        for partition in result.partitions(fetch_size):
+            fetched += len(partition)
+    else:
+        result = connection.execute(text(sql))
+        executed = time.perf_counter()
+        if mode == 'fetchone':
+            while result.fetchone() is not None:
+                fetched += 1
+        elif mode == 'fetchmany':
+            while True:
+                chunk = result.fetchmany(fetch_size)
+                if not chunk:
+                    break
+                fetched += len(chunk)
+        elif mode == 'scalars':
+            fetched = len(result.scalars().all())
+        else:
+            fetched = len(result.fetchall())
+    end = time.perf_counter()
+
+    connection.close()
+    engine.dispose()
+
+    if fetched != rows:
+        raise AssertionError('expected {0} rows, fetched {1}'.format(rows, fetched))
+    return {
+        'dataset': '{0}_{1}'.format(shape, kind),
+        'rows': rows,
+        'endpoints': endpoints,
+        'mode': mode,
+        'connect_s': connected - start,
+        'execute_s': executed - connected,
+        'fetch_s': end - executed,
+        'total_s': end - start,
+        'rows_per_s': rows / (end - start),
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def _run_isolated(port, case, fetch_size):
+    shape, kind, rows, endpoints, mode = case
+    output = subprocess.check_output([
+        sys.executable, '-m', 'benchmarks.bench_fetch', '--run-case', str(port),
+        shape, kind, str(rows), str(endpoints), mode, '--fetch-size', str(fetch_size)])
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def _key(result):
+    return (result['dataset'], result['rows'], result['mode'])
+
+
+def _print(results, baseline=None):
+    header = '{0:<16} {1:>10} {2:>10} {3:>14} {4:>10} {5:>12}'.format(
+        'dataset', 'rows', 'mode', 'rows/s', 'total s', 'peak RSS MB')
+    if baseline:
+        header += ' {0:>10}'.format('vs base')
+    print(header)
+    base = {_key(r): r for r in baseline or []}
+    for r in results:
+        line = '{0:<16} {1:>10} {2:>10} {3:>14,.0f} {4:>10.3f} {5:>12.1f}'.format(
+            r['dataset'], r['rows'], r['mode'], r['rows_per_s'], r['total_s'], r['peak_rss_mb'])
+        if _key(r) in base:
+            line += ' {0:>+9.1f}%'.format((r['rows_per_s'] / base[_key(r)]['rows_per_s'] - 1) * 100)
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--full', action='store_true', help='include 10M and 50M row results')
+    parser.add_argument('--modes', nargs='+', choices=FETCH_MODES, default=list(FETCH_MODES))
+    parser.add_argument('--fetch-size', type=int, default=10000)
+    parser.add_argument('--max-rows', type=int, help='skip datasets larger than this')
+    parser.add_argument('--compression', choices=('lz4', 'zstd'),
+                        help='have the stand-in send compressed Arrow IPC streams')
+    parser.add_argument('--save', action='store_true', help='save the results under ' + RESULTS_DIR)
+    parser.add_argument('--compare', metavar='RESULTS', help='a saved results file to compare against')
+    parser.add_argument('--run-case', nargs=6, metavar=('PORT', 'SHAPE', 'KIND', 'ROWS', 'ENDPOINTS', 'MODE'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        port, shape, kind, rows, endpoints, mode = args.run_case
+        print(json.dumps(run_case(int(port), shape, kind, int(rows), int(endpoints), mode, args.fetch_size)))
+        return
+
+    cases = [dataset + (mode,) for dataset in _datasets(args.full) for mode in args.modes
+             if args.max_rows is None or dataset[2] <= args.max_rows]
+    # Row-at-a-time loops over tens of millions of rows measure nothing new.
+    cases = [c for c in cases if not (c[4] == 'fetchone' and c[2] > 1000000)]
+
+    results = []
+    with ServerProcess(compression=args.compression) as port:
+        for case in cases:
+            results.append(_run_isolated(port, case, args.fetch_size))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    _print(results, baseline)
+
+    if args.save:
+        if not os.path.isdir(RESULTS_DIR):
+            os.makedirs(RESULTS_DIR)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(RESULTS_DIR, 'fetch-{0}-{1}.json'.format(stamp, _git_revision()))
+        with open(path, 'w') as f:
+            json.dump({'revision': _git_revision(), 'python': sys.version.split()[0],
+                       'results': results}, f, indent=2)
+        print('saved', path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Measure what `import sqlalchemy_dremio` and loading the dialect class cost a
+process that never connects, as entry-point discovery does, with Python's
+`-X importtime` in fresh interpreters.
+
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --repeat 20 --budget-ms 20
+
+Reports the median cumulative import time of the sqlalchemy_dremio modules,
+beyond sqlalchemy itself, and whether pyarrow, pandas or grpc were imported.
+Exits with status 1 when the median exceeds --budget-ms or a heavy module
+is imported.
+"""
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+
+# Imported first so that its own cost is not counted.
+STATEMENT = ('import sqlalchemy; import sqlalchemy_dremio; '
+             'from sqlalchemy.dialects import registry; registry.load("dremio.flight")')
+
+HEAVY_MODULES = ('pyarrow', 'pandas', 'grpc')
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def measure():
+    """Return the cumulative microseconds of the sqlalchemy_dremio modules, and the heavy modules imported."""
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', STATEMENT],
+                            stderr=subprocess.PIPE, universal_newlines=True, check=True).stderr
+    total = 0
+    heavy = set()
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if match is None:
+            continue
+        cumulative, indent, module = int(match.group(2)), len(match.group(3)), match.group(4)
+        # Top-level entries include their submodules, so only those are summed.
+        if indent == 1 and module.split('.')[0] == 'sqlalchemy_dremio':
+            total += cumulative
+        if module.split('.')[0] in HEAVY_MODULES:
+            heavy.add(module.split('.')[0])
+    return total, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10, help='fresh interpreters to run')
+    parser.add_argument('--budget-ms', type=float, default=25.0,
+                        help='the median import time above which the run fails')
+    args = parser.parse_args()
+
+    times = []
+    heavy = set()
+    for _ in range(args.repeat):
+        total, imported = measure()
+        times.append(total / 1000.0)
+        heavy |= imported
+
+    median = statistics.median(times)
+    print('sqlalchemy_dremio import ms: median={0:.1f} min={1:.1f} max={2:.1f} ({3} runs)'.format(
+        median, min(times), max(times), args.repeat))
+    print('heavy modules imported: {0}'.format(', '.join(sorted(heavy)) or 'none'))
+
+    failed = False
+    if median > args.budget_ms:
+        print('FAIL: median {0:.1f} ms exceeds the budget of {1:.1f} ms'.format(median, args.budget_ms))
+        failed = True
+    if heavy:
+        print('FAIL: {0} imported without a connection'.format(', '.join(sorted(heavy))))
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Compare the IN list strategies of the dialect (see
+`sqlalchemy_dremio.flight.IN_LIST_STRATEGIES`) on `id IN (...)` lookups:
+the time to compile the statement and render its values, the SQL text
+sent, and the end-to-end latency against the Flight stand-in.
+
+    python -m benchmarks.bench_in_list
+    python -m benchmarks.bench_in_list --sizes 1000,50000 --plan-ms-per-kb 0.5
+
+The stand-in does not parse SQL; --latency and --plan-ms-per-kb make its
+get_flight_info take a fixed time plus a time per KB of statement, standing
+in for Dremio planning and parsing. Each statement returns one row.
+"""
+import argparse
+import statistics
+import time
+
+from sqlalchemy import Integer, String, column, create_engine, select, table
+
+from benchmarks.flight_server import ServerProcess, connection_url
+from sqlalchemy_dremio.flight import IN_LIST_STRATEGIES
+from sqlalchemy_dremio.params import render_pyformat, split_in_lists
+
+lookup = table('lookup', column('id', Integer), column('name', String), schema='bench')
+
+
+def render(dialect, statement):
+    """Compile `statement` without the statement cache and render the SQL sent; returns the statements."""
+    compiled = statement.compile(dialect=dialect)
+    expanded = compiled._process_parameters_for_postcompile(compiled.construct_params())
+    return [render_pyformat(expanded.statement, chunk) for chunk in split_in_lists(expanded.parameters)]
+
+
+def bench(port, strategy, size, args):
+    engine = create_engine(connection_url(port, in_list_strategy=strategy, in_list_threshold=args.threshold,
+                                          in_list_chunks=args.chunks))
+    statement = select(lookup).where(lookup.c.id.in_(list(range(size))))
+
+    render_times = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        queries = render(engine.dialect, statement)
+        render_times.append(time.perf_counter() - start)
+
+    latencies = []
+    with engine.connect() as connection:
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            connection.execute(statement).fetchall()
+            latencies.append(time.perf_counter() - start)
+    engine.dispose()
+    return (statistics.median(render_times), sum(len(q) for q in queries) / 1024.0, len(queries),
+            statistics.median(latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,50000', help='comma-separated IN list sizes')
+    parser.add_argument('--threshold', type=int, default=1000, help='the in_list_threshold')
+    parser.add_argument('--chunks', type=int, default=4, help='the in_list_chunks of the chunk strategy')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per case; the median is reported')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds the stand-in plans each statement')
+    parser.add_argument('--plan-ms-per-kb', type=float, default=0.2,
+                        help='milliseconds the stand-in spends per KB of statement text')
+    args = parser.parse_args()
+
+    print('{0:>7} {1:<7} {2:>10} {3:>9} {4:>7} {5:>10}'.format(
+        'size', 'strategy', 'render ms', 'SQL KB', 'stmts', 'e2e ms'))
+    with ServerProcess(latency=args.latency, plan_ms_per_kb=args.plan_ms_per_kb) as port:
+        for size in [int(s) for s in args.sizes.split(',')]:
+            for strategy in IN_LIST_STRATEGIES:
+                render_s, kb, statements, latency = bench(port, strategy, size, args)
+                print('{0:>7} {1:<7} {2:>10.1f} {3:>9.1f} {4:>7} {5:>10.1f}'.format(
+                    size, strategy, render_s * 1000, kb, statements, latency * 1000))
+
+
+if __name__ == '__main__':
+    main()
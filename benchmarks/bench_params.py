@@ -0,0 +1,57 @@
+"""
+Compare the single-pass `?` renderer used by the ODBC dialect's do_execute
+with the previous approach of one `str.replace(..., 1)` per parameter.
+
+    python -m benchmarks.bench_params --sizes 100 1000 10000
+"""
+import argparse
+import timeit
+
+from sqlalchemy_dremio.params import _qmark_plan, render_qmark
+
+
+def legacy_render(statement, parameters):
+    replaced_stmt = statement
+    for v in parameters:
+        escaped_str = str(v).replace("'", "''")
+        if isinstance(v, (int, float)):
+            replaced_stmt = replaced_stmt.replace('?', escaped_str, 1)
+        else:
+            replaced_stmt = replaced_stmt.replace('?', "'" + escaped_str + "'", 1)
+    return replaced_stmt
+
+
+def in_list_statement(size):
+    return ('SELECT id, name FROM "space"."customers" WHERE id IN ('
+            + ', '.join(['?'] * size) + ')')
+
+
+def bench(size, repeat):
+    statement = in_list_statement(size)
+    parameters = list(range(size))
+
+    legacy = min(timeit.repeat(lambda: legacy_render(statement, parameters), number=1, repeat=repeat))
+
+    def uncached():
+        _qmark_plan.cache_clear()
+        render_qmark(statement, parameters)
+
+    cold = min(timeit.repeat(uncached, number=1, repeat=repeat))
+    warm = min(timeit.repeat(lambda: render_qmark(statement, parameters), number=1, repeat=repeat))
+    return legacy, cold, warm
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print('{0:>8} {1:>14} {2:>14} {3:>14}'.format('params', 'legacy ms', 'single-pass ms', 'cached plan ms'))
+    for size in args.sizes:
+        legacy, cold, warm = bench(size, args.repeat)
+        print('{0:>8} {1:>14.3f} {2:>14.3f} {3:>14.3f}'.format(size, legacy * 1e3, cold * 1e3, warm * 1e3))
+
+
+if __name__ == '__main__':
+    main()
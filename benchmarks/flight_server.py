@@ -0,0 +1,245 @@
+"""
+An in-process stand-in for Dremio's Arrow Flight endpoint serving synthetic
+results, so the client can be measured without a live Dremio.
+
+Queries select a dataset by name:
+
+    SELECT * FROM synthetic.<shape>_<kind>_<rows>[_<endpoints>]
+
+shape is `narrow` (4 columns) or `wide` (64 columns), kind is `numeric`,
+`string`, `category` (the strings, dictionary-encoded) or `mixed`, and the rows are split evenly over `endpoints` Flight
+endpoints (default 1). Any other query returns a single row.
+"""
+import decimal
+import multiprocessing
+import random
+import re
+import threading
+import time
+
+import pyarrow as pa
+from pyarrow import flight
+
+BATCH_SIZE = 65536
+
+_DATASET = re.compile(r'synthetic\.(narrow|wide)_(numeric|string|category|mixed)_(\d+)(?:_(\d+))?', re.I)
+
+_COLUMNS = {'narrow': 4, 'wide': 64}
+
+
+def dataset_query(shape, kind, rows, endpoints=1):
+    """Return the query selecting a synthetic dataset."""
+    return 'SELECT * FROM synthetic.{0}_{1}_{2}_{3}'.format(shape, kind, rows, endpoints)
+
+
+def _column(kind, index, rng):
+    if kind == 'mixed':
+        kind = ('numeric', 'string', 'timestamp', 'decimal', 'bool')[index % 5]
+    if kind == 'numeric':
+        if index % 2:
+            return pa.array([rng.random() * 1e6 for _ in range(BATCH_SIZE)], pa.float64())
+        return pa.array([rng.randrange(-2 ** 62, 2 ** 62) for _ in range(BATCH_SIZE)], pa.int64())
+    if kind == 'category':
+        return _column('string', index, rng).dictionary_encode()
+    if kind == 'string':
+        values = ['value-{0:010d}'.format(rng.randrange(1000)) for _ in range(BATCH_SIZE)]
+        return pa.array(values, pa.string())
+    if kind == 'timestamp':
+        return pa.array([rng.randrange(0, 2 ** 40) for _ in range(BATCH_SIZE)], pa.timestamp('ms'))
+    if kind == 'decimal':
+        return pa.array([decimal.Decimal(rng.randrange(-10 ** 9, 10 ** 9)).scaleb(-3) for _ in range(BATCH_SIZE)],
+                        pa.decimal128(18, 3))
+    return pa.array([rng.random() < 0.5 for _ in range(BATCH_SIZE)], pa.bool_())
+
+
+_batches = {}
+_batches_lock = threading.Lock()
+
+
+def template_batch(shape, kind):
+    """
+    Return a BATCH_SIZE-row record batch of the given shape. It is generated
+    once and then repeated, so serving millions of rows costs no generation.
+    """
+    key = (shape, kind)
+    with _batches_lock:
+        if key not in _batches:
+            rng = random.Random(42)
+            columns = [_column(kind, i, rng) for i in range(_COLUMNS[shape])]
+            names = ['c{0}'.format(i) for i in range(len(columns))]
+            _batches[key] = pa.RecordBatch.from_arrays(columns, names=names)
+        return _batches[key]
+
+
+class _HeaderRecorder(flight.ServerMiddlewareFactory):
+    """Keeps the request headers of the last get_flight_info call."""
+
+    def __init__(self):
+        self.headers = {}
+
+    def start_call(self, info, headers):
+        if info.method == flight.FlightMethod.GET_FLIGHT_INFO:
+            self.headers = headers
+        return None
+
+
+class SyntheticFlightServer(flight.FlightServerBase):
+    """
+    A Flight server answering queries with synthetic record batches.
+
+    Parameters
+    ----------
+    location : str
+        The location to listen on; port 0 picks a free port.
+    latency : float
+        Seconds get_flight_info sleeps before answering, standing in for
+        Dremio's planning and queueing time.
+    plan_ms_per_kb : float
+        Milliseconds get_flight_info sleeps per KB of query text, standing in
+        for the time Dremio takes to parse and plan long statements.
+    compression : str
+        Arrow IPC codec ("lz4" or "zstd") of the streams do_get sends, or
+        None for uncompressed streams.
+    stall_rate, stall : float
+        The fraction of get_flight_info calls that stall for `stall` more
+        seconds, standing in for a busy coordinator.
+    fail_rate : float
+        The fraction of do_get streams failing with UNAVAILABLE after their
+        first batch.
+
+    `stall_next` and `fail_next` make the next that many calls stall or
+    fail regardless of the rates. `last_headers` holds the request headers
+    of the last get_flight_info call.
+    """
+
+    def __init__(self, location='grpc://localhost:0', latency=0.0, compression=None,
+                 stall_rate=0.0, stall=0.0, fail_rate=0.0, plan_ms_per_kb=0.0, **kwargs):
+        self._recorder = _HeaderRecorder()
+        kwargs.setdefault('middleware', {})['headers'] = self._recorder
+        super(SyntheticFlightServer, self).__init__(location, **kwargs)
+        self.latency = latency
+        self.plan_ms_per_kb = plan_ms_per_kb
+        self.write_options = pa.ipc.IpcWriteOptions(compression=compression)
+        self.stall_rate = stall_rate
+        self.stall = stall
+        self.fail_rate = fail_rate
+        self.stall_next = 0
+        self.fail_next = 0
+        self.peers = set()
+        self.queries = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(7)
+
+    @property
+    def last_headers(self):
+        return self._recorder.headers
+
+    def _fault(self, kind):
+        """Decide whether this call stalls ("stall") or fails ("fail")."""
+        with self._lock:
+            if getattr(self, kind + '_next'):
+                setattr(self, kind + '_next', getattr(self, kind + '_next') - 1)
+                return True
+            return self._random.random() < getattr(self, kind + '_rate')
+
+    def _parse(self, query):
+        match = _DATASET.search(query)
+        if match is None:
+            return None
+        shape, kind, rows, endpoints = match.groups()
+        return shape.lower(), kind.lower(), int(rows), int(endpoints or 1)
+
+    def get_flight_info(self, context, descriptor):
+        with self._lock:
+            self.peers.add(context.peer())
+            self.queries += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.plan_ms_per_kb:
+            time.sleep(len(descriptor.command) / 1024.0 * self.plan_ms_per_kb / 1000.0)
+        if self._fault('stall'):
+            time.sleep(self.stall)
+
+        query = descriptor.command.decode('utf-8')
+        spec = self._parse(query)
+        if spec is None:
+            schema = pa.schema([('EXPR$0', pa.int32())])
+            return flight.FlightInfo(schema, descriptor, [flight.FlightEndpoint(b'one', [])], 1, -1)
+
+        shape, kind, rows, endpoints = spec
+        schema = template_batch(shape, kind).schema
+        tickets = ['{0}|{1}'.format(query, i).encode('utf-8') for i in range(endpoints)]
+        return flight.FlightInfo(schema, descriptor, [flight.FlightEndpoint(t, []) for t in tickets], rows, -1)
+
+    def do_get(self, context, ticket):
+        with self._lock:
+            self.peers.add(context.peer())
+        query, _, index = ticket.ticket.decode('utf-8').rpartition('|')
+        spec = self._parse(query)
+        if spec is None:
+            return flight.RecordBatchStream(pa.table({'EXPR$0': pa.array([1], pa.int32())}))
+
+        shape, kind, rows, endpoints = spec
+        batch = template_batch(shape, kind)
+        index = int(index)
+        start = rows * index // endpoints
+        count = rows * (index + 1) // endpoints - start
+
+        fail = self._fault('fail')
+
+        def batches():
+            remaining = count
+            while remaining > 0:
+                size = min(remaining, BATCH_SIZE)
+                yield batch if size == BATCH_SIZE else batch.slice(0, size)
+                remaining -= size
+                if fail:
+                    raise flight.FlightUnavailableError('stream interrupted')
+
+        if kind == 'category':
+            # GeneratorStream cannot send the dictionaries of dictionary batches.
+            reader = pa.RecordBatchReader.from_batches(batch.schema, batches())
+            return flight.RecordBatchStream(reader, options=self.write_options)
+        return flight.GeneratorStream(batch.schema, batches(), options=self.write_options)
+
+
+def connection_url(port, **query):
+    """Return a dremio+flight URL for a stand-in listening on `port`."""
+    params = {'Token': 'benchmark', 'UseEncryption': 'false'}
+    params.update(query)
+    return 'dremio+flight://localhost:{0}/?{1}'.format(port, '&'.join('{0}={1}'.format(k, v) for k, v in params.items()))
+
+
+def _serve(conn, kwargs):
+    server = SyntheticFlightServer(**kwargs)
+    conn.send(server.port)
+    conn.recv()
+    server.shutdown()
+
+
+class ServerProcess(object):
+    """
+    Run a SyntheticFlightServer in a child process, keeping its memory and
+    CPU use out of the measurements of the client process.
+
+        with ServerProcess() as port:
+            engine = create_engine(connection_url(port))
+
+    Keyword arguments are passed to SyntheticFlightServer.
+    """
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+    def __enter__(self):
+        self._conn, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_serve, args=(child, self.kwargs), daemon=True)
+        self._process.start()
+        self.port = self._conn.recv()
+        return self.port
+
+    def __exit__(self, *exc):
+        self._conn.send('stop')
+        self._process.join(10)
+        if self._process.is_alive():
+            self._process.terminate()
@@ -0,0 +1,286 @@
+"""
+Drive the Flight DB-API through SQLAlchemy with many concurrent workers at
+a target rate against the Flight stand-in, to expose scaling limits and
+leaks in `db.Connection`/`db.Cursor`.
+
+    python -m benchmarks.loadtest --mode thread --workers 16 --qps 200 --duration 60
+    python -m benchmarks.loadtest --mode process --workers 4 --duration 600
+    python -m benchmarks.loadtest --mode asyncio --workers 64 --pool queue
+
+Reports throughput, latency percentiles, errors, DB-API connections opened
+and closed by the pool, live connections/cursors, and RSS growth sampled
+over the run.
+
+The stand-in can stall get_flight_info and break do_get streams, to compare
+the tail latency with and without retries and hedging:
+
+    python -m benchmarks.loadtest --stall-rate 0.02 --stall 2 --fail-rate 0.01
+    python -m benchmarks.loadtest --stall-rate 0.02 --stall 2 --fail-rate 0.01 \\
+        --param MaxRetries=3 --param HedgeAfter=100
+"""
+import argparse
+import asyncio
+import collections
+import gc
+import math
+import multiprocessing
+import os
+import resource
+import sys
+import threading
+import time
+
+from benchmarks.flight_server import ServerProcess, connection_url, dataset_query
+
+
+def _rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024.0 * 1024.0)
+    except (IOError, OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+def _live_dbapi_objects():
+    from sqlalchemy_dremio import db
+
+    connections = [o for o in gc.get_objects() if isinstance(o, db.Connection)]
+    open_connections = [c for c in connections if not c.closed]
+    return len(open_connections), sum(len(c.cursors) for c in connections)
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    # Nearest-rank percentile.
+    index = min(len(values) - 1, max(0, int(math.ceil(q / 100.0 * len(values))) - 1))
+    return values[index]
+
+
+class Run(object):
+    """Latencies, errors and resource samples collected by one process."""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = collections.Counter()
+        self.opened = 0
+        self.closed = 0
+        self.retries = 0
+        self.hedged = 0
+        self.hedges_won = 0
+        self.samples = []
+        self.lock = threading.Lock()
+
+    def record(self, latency, error=None):
+        with self.lock:
+            if error is not None:
+                message = str(error).splitlines()[0].split('. gRPC client debug context')[0]
+                self.errors['{0}: {1}'.format(type(error).__name__, message)] += 1
+            else:
+                self.latencies.append(latency)
+
+    def as_dict(self):
+        return {'latencies': self.latencies, 'errors': self.errors, 'opened': self.opened,
+                'closed': self.closed, 'retries': self.retries, 'hedged': self.hedged,
+                'hedges_won': self.hedges_won, 'samples': self.samples}
+
+
+def _create_engine(port, args, run):
+    from sqlalchemy import create_engine, event, pool as sa_pool
+
+    poolclass = {'singleton': None, 'queue': sa_pool.QueuePool, 'null': sa_pool.NullPool}[args.pool]
+    kwargs = {'poolclass': poolclass} if poolclass else {}
+    engine = create_engine(connection_url(port, **dict(p.split('=', 1) for p in args.param)), **kwargs)
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        with run.lock:
+            run.opened += 1
+
+    @event.listens_for(engine, 'close')
+    def on_close(dbapi_connection, connection_record):
+        with run.lock:
+            run.closed += 1
+
+    return engine
+
+
+def _query_once(engine, sql, run):
+    from sqlalchemy import text
+
+    start = time.perf_counter()
+    try:
+        with engine.connect() as connection:
+            result = connection.execute(text(sql))
+            result.fetchall()
+    except Exception as e:
+        run.record(time.perf_counter() - start, e)
+    else:
+        run.record(time.perf_counter() - start)
+        # The streams are read by the fetch, so the stats are complete now.
+        stats = result.context.cursor.stats
+        with run.lock:
+            run.retries += stats.retries
+            run.hedged += stats.hedged
+            run.hedges_won += stats.hedge_won
+
+
+def _paced(deadline, interval, fn):
+    """Call `fn` every `interval` seconds (back to back if 0) until `deadline`."""
+    next_start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        fn()
+        if interval:
+            next_start += interval
+            delay = next_start - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+
+def _sampler(run, deadline, interval, stop):
+    while not stop.wait(interval) and time.perf_counter() < deadline:
+        connections, cursors = _live_dbapi_objects()
+        run.samples.append((time.perf_counter(), _rss_mb(), connections, cursors))
+
+
+def run_threads(port, args, workers, qps):
+    run = Run()
+    engine = _create_engine(port, args, run)
+    sql = args.query
+    deadline = time.perf_counter() + args.duration
+    interval = workers / qps if qps else 0
+
+    stop = threading.Event()
+    sampler = threading.Thread(target=_sampler, args=(run, deadline, args.sample_interval, stop), daemon=True)
+    sampler.start()
+    threads = [threading.Thread(target=_paced, args=(deadline, interval, lambda: _query_once(engine, sql, run)))
+               for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stop.set()
+    sampler.join()
+    engine.dispose()
+    return run
+
+
+def run_asyncio(port, args, workers, qps):
+    run = Run()
+    engine = _create_engine(port, args, run)
+    deadline = time.perf_counter() + args.duration
+    interval = workers / qps if qps else 0
+
+    async def task():
+        loop = asyncio.get_running_loop()
+        next_start = time.perf_counter()
+        while time.perf_counter() < deadline:
+            await loop.run_in_executor(None, _query_once, engine, args.query, run)
+            if interval:
+                next_start += interval
+                await asyncio.sleep(max(0, next_start - time.perf_counter()))
+
+    async def main():
+        from concurrent.futures import ThreadPoolExecutor
+
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=workers))
+        await asyncio.gather(*[task() for _ in range(workers)])
+
+    stop = threading.Event()
+    sampler = threading.Thread(target=_sampler, args=(run, deadline, args.sample_interval, stop), daemon=True)
+    sampler.start()
+    asyncio.run(main())
+    stop.set()
+    sampler.join()
+    engine.dispose()
+    return run
+
+
+def _process_worker(port, args, qps, queue):
+    queue.put(run_threads(port, args, 1, qps).as_dict())
+
+
+def run_processes(port, args):
+    queue = multiprocessing.Queue()
+    qps = args.qps / args.workers if args.qps else 0
+    processes = [multiprocessing.Process(target=_process_worker, args=(port, args, qps, queue))
+                 for _ in range(args.workers)]
+    for process in processes:
+        process.start()
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    run = Run()
+    for result in results:
+        run.latencies.extend(result['latencies'])
+        run.errors.update(result['errors'])
+        run.opened += result['opened']
+        run.closed += result['closed']
+        run.retries += result['retries']
+        run.hedged += result['hedged']
+        run.hedges_won += result['hedges_won']
+    # Resource samples are per process; report the first worker's.
+    run.samples = results[0]['samples']
+    return run
+
+
+def report(run, args, elapsed):
+    completed = len(run.latencies)
+    print('mode={0} workers={1} pool={2} target_qps={3} duration={4:.0f}s'.format(
+        args.mode, args.workers, args.pool, args.qps or 'max', elapsed))
+    print('queries: {0} ok, {1} errors, {2:.1f} q/s'.format(completed, sum(run.errors.values()), completed / elapsed))
+    for error, count in run.errors.most_common(5):
+        print('  {0:>8} x {1}'.format(count, error[:120]))
+    print('latency ms: p50={0:.2f} p90={1:.2f} p99={2:.2f} max={3:.2f}'.format(
+        *[percentile(run.latencies, q) * 1000 for q in (50, 90, 99, 100)]))
+    print('retries: {0}; hedged get_flight_info: {1} sent, {2} answered first'.format(
+        run.retries, run.hedged, run.hedges_won))
+    print('DB-API connections: {0} opened, {1} closed by the pool'.format(run.opened, run.closed))
+    if len(run.samples) >= 2:
+        (t0, rss0, conns0, cursors0), (t1, rss1, conns1, cursors1) = run.samples[0], run.samples[-1]
+        minutes = max(t1 - t0, 1e-9) / 60.0
+        print('RSS MB: {0:.1f} -> {1:.1f} ({2:+.2f} MB/min)'.format(rss0, rss1, (rss1 - rss0) / minutes))
+        print('open connections: {0} -> {1}; cursors held by connections: {2} -> {3}'.format(
+            conns0, conns1, cursors0, cursors1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=('thread', 'process', 'asyncio'), default='thread')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--qps', type=float, default=0, help='target total queries per second, 0 for unbounded')
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run')
+    parser.add_argument('--pool', choices=('singleton', 'queue', 'null'), default='singleton',
+                        help="the engine's pool class; singleton is the dialect default")
+    parser.add_argument('--query', default=dataset_query('narrow', 'mixed', 100),
+                        help='the statement each worker runs')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds the stand-in spends "planning" each query')
+    parser.add_argument('--stall-rate', type=float, default=0.0,
+                        help='fraction of get_flight_info calls the stand-in stalls')
+    parser.add_argument('--stall', type=float, default=1.0, help='seconds a stalled call takes')
+    parser.add_argument('--fail-rate', type=float, default=0.0,
+                        help='fraction of do_get streams the stand-in breaks with UNAVAILABLE')
+    parser.add_argument('--param', action='append', default=[], metavar='KEY=VALUE',
+                        help='a connection property added to the URL, e.g. MaxRetries=3')
+    parser.add_argument('--sample-interval', type=float, default=1.0)
+    args = parser.parse_args()
+
+    with ServerProcess(latency=args.latency, stall_rate=args.stall_rate, stall=args.stall,
+                       fail_rate=args.fail_rate) as port:
+        start = time.perf_counter()
+        if args.mode == 'process':
+            run = run_processes(port, args)
+        elif args.mode == 'asyncio':
+            run = run_asyncio(port, args, args.workers, args.qps)
+        else:
+            run = run_threads(port, args, args.workers, args.qps)
+        elapsed = time.perf_counter() - start
+    report(run, args, elapsed)
+
+
+if __name__ == '__main__':
+    main()
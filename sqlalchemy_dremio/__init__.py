@@ -1,7 +1,15 @@
 __version__ = '3.0.4'
 
-from .db import Connection, connect
 from sqlalchemy.dialects import registry
 
 # Register the Flight end point
 registry.register("dremio+flight", "sqlalchemy_dremio.flight", "DremioDialect_flight")
+
+
+def __getattr__(name):
+    # The DB-API module imports pyarrow, so it is only loaded once used, not
+    # whenever the package is imported for dialect registration or discovery.
+    if name in ('Connection', 'connect'):
+        from sqlalchemy_dremio import db
+        return getattr(db, name)
+    raise AttributeError('module {0!r} has no attribute {1!r}'.format(__name__, name))
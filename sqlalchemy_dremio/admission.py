@@ -0,0 +1,145 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import heapq
+import itertools
+import threading
+import time
+
+from sqlalchemy_dremio.exceptions import OperationalError
+
+DEFAULT_KEY = 'default'
+# Seconds a statement waits for admission by default.
+DEFAULT_TIMEOUT = 600.0
+
+
+def admission_key(headers):
+    """
+    Return the key a statement is admitted under: its routing queue, else its
+    routing engine, else "default". `headers` maps Dremio header names to
+    values.
+    """
+    return headers.get('routing_queue') or headers.get('routing_engine') or DEFAULT_KEY
+
+
+def parse_limits(value):
+    """Parse QueueLimits, e.g. "interactive:16,large:2", into a dict."""
+    limits = {}
+    for item in value.split(','):
+        if item.strip():
+            key, _, limit = item.rpartition(':')
+            limits[key.strip()] = int(limit)
+    return limits
+
+
+class _Gate(object):
+    """The in-flight count, waiters and statistics of one admission key."""
+
+    __slots__ = ('limit', 'active', 'waiting', 'admitted', 'timed_out', 'max_active', 'max_waiting',
+                 'wait_ms_total', 'wait_ms_max')
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        # Heap of [-priority, sequence, event]: highest priority first, then FIFO.
+        self.waiting = []
+        self.admitted = 0
+        self.timed_out = 0
+        self.max_active = 0
+        self.max_waiting = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+
+class AdmissionController(object):
+    """
+    Caps the queries in flight per admission key (routing queue or engine).
+    Statements over the cap wait, and are admitted highest priority first
+    and in arrival order within a priority.
+
+    Parameters
+    ----------
+    default_limit : int
+        The cap for keys without their own limit, or None for no cap.
+    limits : dict
+        Caps by admission key.
+    timeout : float
+        Seconds a statement may wait before OperationalError is raised, or
+        None to wait indefinitely.
+    """
+
+    def __init__(self, default_limit=None, limits=None, timeout=DEFAULT_TIMEOUT):
+        self.default_limit = default_limit
+        self.limits = dict(limits or {})
+        self.timeout = timeout
+        self._gates = {}
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def _gate(self, key):
+        gate = self._gates.get(key)
+        if gate is None:
+            gate = self._gates[key] = _Gate(self.limits.get(key, self.default_limit))
+        return gate
+
+    def acquire(self, key, priority=0):
+        """
+        Wait until a statement may run under `key`. Returns the milliseconds
+        spent waiting. Every acquire must be paired with a `release`.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            gate = self._gate(key)
+            if gate.limit is None or (gate.active < gate.limit and not gate.waiting):
+                gate.active += 1
+                self._admitted(gate, 0.0)
+                return 0.0
+            waiter = [-priority, next(self._sequence), threading.Event()]
+            heapq.heappush(gate.waiting, waiter)
+            gate.max_waiting = max(gate.max_waiting, len(gate.waiting))
+
+        if not waiter[2].wait(self.timeout):
+            with self._lock:
+                # The slot may have been handed over just as the wait timed out.
+                if not waiter[2].is_set():
+                    gate.waiting.remove(waiter)
+                    heapq.heapify(gate.waiting)
+                    gate.timed_out += 1
+                    raise OperationalError('Timed out after {0:.0f} ms waiting for admission to {1!r}'.format(
+                        (time.perf_counter() - start) * 1000.0, key))
+
+        waited_ms = (time.perf_counter() - start) * 1000.0
+        with self._lock:
+            self._admitted(gate, waited_ms)
+        return waited_ms
+
+    def _admitted(self, gate, waited_ms):
+        gate.admitted += 1
+        gate.max_active = max(gate.max_active, gate.active)
+        gate.wait_ms_total += waited_ms
+        gate.wait_ms_max = max(gate.wait_ms_max, waited_ms)
+
+    def release(self, key):
+        """Give up the slot taken by `acquire`, handing it to the next waiter."""
+        with self._lock:
+            gate = self._gates[key]
+            if gate.waiting:
+                # The slot passes straight to the waiter, so `active` is unchanged.
+                heapq.heappop(gate.waiting)[2].set()
+            else:
+                gate.active -= 1
+
+    def stats(self):
+        """
+        Return a dict by admission key of: limit, active and waiting (queue
+        depth) now, max_active and max_waiting seen, admitted and timed_out
+        counts, and the total and maximum wait in milliseconds.
+        """
+        with self._lock:
+            return {key: {'limit': gate.limit, 'active': gate.active, 'waiting': len(gate.waiting),
+                          'max_active': gate.max_active, 'max_waiting': gate.max_waiting,
+                          'admitted': gate.admitted, 'timed_out': gate.timed_out,
+                          'wait_ms_total': gate.wait_ms_total, 'wait_ms_max': gate.wait_ms_max}
+                    for key, gate in self._gates.items()}
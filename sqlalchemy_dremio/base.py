@@ -2,6 +2,8 @@ from sqlalchemy import schema, types, pool
 from sqlalchemy.engine import default, reflection
 from sqlalchemy.sql import compiler
 
+from sqlalchemy_dremio.params import render_qmark
+
 _dialect_name = "dremio"
 
 _type_map = {
@@ -238,15 +240,8 @@ class DremioDialect(default.DefaultDialect):
     # Workaround since Dremio does not support parameterized stmts
     # Old queries should not have used queries with parameters, since Dremio does not support it
     # and these queries failed. If there is no parameter, everything should work as before.
+    # Placeholders inside string literals, quoted identifiers and comments are left alone.
     def do_execute(self, cursor, statement, parameters, context):
-        replaced_stmt = statement
-        for v in parameters:
-            escaped_str = str(v).replace("'", "''")
-            if isinstance(v, (int, float)):
-                replaced_stmt = replaced_stmt.replace('?', escaped_str, 1)
-            else:
-                replaced_stmt = replaced_stmt.replace('?', "'" + escaped_str + "'", 1)
-
         super(DremioDialect, self).do_execute_no_params(
-            cursor, replaced_stmt, context
+            cursor, render_qmark(statement, parameters), context
         )
@@ -0,0 +1,115 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from sqlalchemy_dremio.exceptions import DataError, NotSupportedError
+
+# The choices of each policy; the first is the default.
+POLICIES = {
+    'decimal': ('decimal', 'float', 'int'),
+    'timestamp': ('datetime', 'naive', 'utc', 'epoch'),
+    'binary': ('bytes', 'memoryview'),
+    'unsigned': ('int', 'signed'),
+}
+
+_SIGNED = {pa.uint8(): pa.int8(), pa.uint16(): pa.int16(), pa.uint32(): pa.int32(), pa.uint64(): pa.int64()}
+
+
+class ConversionPolicy(object):
+    """
+    How result columns are converted to Python values. Casts are applied to
+    whole Arrow columns before any Python object is created.
+
+    decimal : 'decimal' for decimal.Decimal, 'float' for float, or 'int' for
+        the unscaled integer, e.g. 12.345 as DECIMAL(10, 3) is 12345
+    timestamp : 'datetime' for datetime.datetime, aware when the column has
+        a time zone; 'naive' for naive datetimes in UTC; 'utc' for
+        UTC-aware datetimes; or 'epoch' for the int since the epoch in the
+        column's unit
+    binary : 'bytes', or 'memoryview' for views of the Arrow buffers
+        without copying
+    unsigned : 'int', or 'signed' to reinterpret unsigned integers as the
+        signed type of the same width, as Java-typed clients see them
+    """
+
+    __slots__ = tuple(POLICIES)
+
+    def __init__(self, decimal='decimal', timestamp='datetime', binary='bytes', unsigned='int'):
+        for name, value in (('decimal', decimal), ('timestamp', timestamp), ('binary', binary),
+                            ('unsigned', unsigned)):
+            if value not in POLICIES[name]:
+                raise NotSupportedError('Unsupported {0} conversion {1!r}, use one of {2}'.format(
+                    name, value, ', '.join(POLICIES[name])))
+            setattr(self, name, value)
+
+    def replace(self, **policies):
+        """Return a copy with some policies replaced."""
+        values = {name: getattr(self, name) for name in POLICIES}
+        values.update(policies)
+        return ConversionPolicy(**values)
+
+    def target_type(self, t):
+        """Return the Arrow type columns of type `t` are cast to, or None."""
+        if pa.types.is_decimal(t):
+            if self.decimal == 'float':
+                return pa.float64()
+            if self.decimal == 'int':
+                return pa.int64()
+        elif pa.types.is_timestamp(t):
+            if self.timestamp == 'naive' and t.tz is not None:
+                return pa.timestamp(t.unit)
+            if self.timestamp == 'utc' and t.tz != 'UTC':
+                return pa.timestamp(t.unit, 'UTC')
+            if self.timestamp == 'epoch':
+                return pa.int64()
+        elif pa.types.is_unsigned_integer(t) and self.unsigned == 'signed':
+            return _SIGNED[t]
+        return None
+
+    def schema(self, schema):
+        """Return `schema` with the types of the columns cast."""
+        for i, field in enumerate(schema):
+            target = self.target_type(field.type)
+            if target is not None:
+                schema = schema.set(i, field.with_type(target))
+        return schema
+
+    def convert(self, table, memory_pool=None):
+        """Return the pa.Table `table` with the columns cast, allocating from `memory_pool`."""
+        for i, field in enumerate(table.schema):
+            target = self.target_type(field.type)
+            if target is not None:
+                table = table.set_column(i, field.with_type(target),
+                                         _cast(table.column(i), field.type, target, memory_pool))
+        return table
+
+
+def _cast(column, source, target, memory_pool=None):
+    if pa.types.is_decimal(source) and pa.types.is_integer(target):
+        # The unscaled value: the storage read as DECIMAL(p, 0), which keeps
+        # the precision, then checked to fit the integer type.
+        unscaled = getattr(pa, 'decimal{0}'.format(source.bit_width))(source.precision, 0)
+        column = pa.chunked_array([chunk.view(unscaled) for chunk in column.chunks], unscaled)
+        try:
+            return pc.cast(column, target, memory_pool=memory_pool)
+        except pa.ArrowInvalid:
+            raise DataError('Unscaled DECIMAL({0}, {1}) values do not fit {2}; use DecimalAs=decimal or float'.format(
+                source.precision, source.scale, target))
+    if pa.types.is_unsigned_integer(source):
+        # Reinterpreted without copying.
+        return pa.chunked_array([chunk.view(target) for chunk in column.chunks], target)
+    return pc.cast(column, target, memory_pool=memory_pool)
+
+
+def binary_views(array):
+    """Return memoryviews of the values of a binary pa.Array, sharing its data buffer."""
+    _, offsets, data = array.buffers()
+    offset_type = pa.int64() if pa.types.is_large_binary(array.type) else pa.int32()
+    bounds = pa.Array.from_buffers(offset_type, len(array) + 1, [None, offsets], offset=array.offset).to_pylist()
+    view = memoryview(data if data is not None else b'')
+    nulls = array.is_null().to_pylist() if array.null_count else [False] * len(array)
+    return [None if null else view[start:end] for null, start, end in zip(nulls, bounds, bounds[1:])]
@@ -3,21 +3,126 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import collections
+import contextlib
+import itertools
 import logging
+import time
+import weakref
 
+import pyarrow as pa
 from pyarrow import flight
 
+from sqlalchemy_dremio.admission import admission_key
+from sqlalchemy_dremio.conversion import ConversionPolicy
 from sqlalchemy_dremio.exceptions import Error, NotSupportedError
-from sqlalchemy_dremio.flight_middleware import CookieMiddlewareFactory
-from sqlalchemy_dremio.query import execute
+from sqlalchemy_dremio.export import check_format, export_batches
+from sqlalchemy_dremio.flight_middleware import CookieMiddlewareFactory, MetricsMiddlewareFactory
+from sqlalchemy_dremio.params import render_pyformat, split_in_lists
+from sqlalchemy_dremio.query import (
+    QueryStats, ResultLimit, RetryPolicy, describe, get_chunked_flight_info, get_flight_info, is_read_only,
+    log_stats, read_table, retry_policy_for, stream_batches, to_rows)
+from sqlalchemy_dremio.rows import DEFAULT_DICTIONARY_THRESHOLD, check_decoding
 
 logger = logging.getLogger(__name__)
 
 paramstyle = 'pyformat'
 
 
-def connect(c):
-    return Connection(c)
+def connect(c, **kwargs):
+    return Connection(c, **kwargs)
+
+
+def _int_property(properties, name):
+    try:
+        return int(properties[name])
+    except ValueError:
+        raise Error('{0} must be an integer, got {1!r}'.format(name, properties[name]))
+
+
+def _float_property(properties, name):
+    try:
+        return float(properties[name])
+    except ValueError:
+        raise Error('{0} must be a number, got {1!r}'.format(name, properties[name]))
+
+
+def channel_options(properties):
+    """
+    Build the gRPC channel arguments for the FlightClient from the
+    connection properties: MaxMessageSize, the KeepAlive* properties, and
+    any `grpc.*` channel argument passed through verbatim.
+    """
+    options = []
+    if 'MaxMessageSize' in properties:
+        size = _int_property(properties, 'MaxMessageSize')
+        options.append(('grpc.max_receive_message_length', size))
+        options.append(('grpc.max_send_message_length', size))
+    if 'KeepAliveTime' in properties:
+        options.append(('grpc.keepalive_time_ms', _int_property(properties, 'KeepAliveTime')))
+    if 'KeepAliveTimeout' in properties:
+        options.append(('grpc.keepalive_timeout_ms', _int_property(properties, 'KeepAliveTimeout')))
+    if 'KeepAliveWithoutCalls' in properties:
+        options.append(('grpc.keepalive_permit_without_calls',
+                        int(properties['KeepAliveWithoutCalls'].lower() == 'true')))
+
+    for key, value in properties.items():
+        if key.startswith('grpc.'):
+            options.append((key, int(value) if value.lstrip('-').isdigit() else value))
+    return options
+
+
+def retry_policy(properties):
+    """
+    Build the RetryPolicy for read-only queries from the MaxRetries,
+    RetryBackoff, RetryBackoffMax and HedgeAfter properties (milliseconds).
+    """
+    policy = RetryPolicy()
+    if 'MaxRetries' in properties:
+        policy.max_retries = _int_property(properties, 'MaxRetries')
+    if 'RetryBackoff' in properties:
+        policy.backoff_ms = _int_property(properties, 'RetryBackoff')
+    if 'RetryBackoffMax' in properties:
+        policy.max_backoff_ms = _int_property(properties, 'RetryBackoffMax')
+    if 'HedgeAfter' in properties:
+        policy.hedge_after_ms = _int_property(properties, 'HedgeAfter')
+    return policy
+
+
+def conversion_policy(properties):
+    """
+    Build the ConversionPolicy of results from the DecimalAs, TimestampAs,
+    BinaryAs and UnsignedAs properties.
+    """
+    names = {'DecimalAs': 'decimal', 'TimestampAs': 'timestamp', 'BinaryAs': 'binary', 'UnsignedAs': 'unsigned'}
+    return ConversionPolicy(**{policy: properties[name].lower() for name, policy in names.items()
+                               if name in properties})
+
+
+# The allocators a connection's memory pool can draw from.
+MEMORY_POOLS = {
+    'default': pa.default_memory_pool,
+    'system': pa.system_memory_pool,
+    'jemalloc': pa.jemalloc_memory_pool,
+    'mimalloc': pa.mimalloc_memory_pool,
+}
+
+
+def memory_pool(properties):
+    """
+    Return an Arrow memory pool of the connection's own, tracking its
+    allocations, over the allocator the MemoryPool property names: default,
+    system, jemalloc or mimalloc.
+    """
+    name = properties.get('MemoryPool', 'default').lower()
+    if name not in MEMORY_POOLS:
+        raise NotSupportedError('Unsupported memory pool {0!r}, use one of {1}'.format(
+            name, ', '.join(MEMORY_POOLS)))
+    try:
+        backend = MEMORY_POOLS[name]()
+    except NotImplementedError:
+        raise NotSupportedError('The {0} allocator is not available in this pyarrow build'.format(name))
+    return pa.proxy_memory_pool(backend)
 
 
 def check_closed(f):
@@ -36,16 +141,35 @@ def check_result(f):
     """Decorator that checks if the cursor has results from `execute`."""
 
     def d(self, *args, **kwargs):
-        if self._results is None:
+        if self._results is None and self._table is None and self._info is None and self._batches is None:
             raise Error('Called before `execute`')
         return f(self, *args, **kwargs)
 
     return d
 
 
+class ChannelPool(object):
+    """
+    FlightClients opened to the same endpoint, each over its own HTTP/2
+    connection, handed out round-robin to spread `do_get` streams.
+    """
+
+    def __init__(self, clients):
+        self.clients = clients
+        self._turn = itertools.count()
+
+    def __len__(self):
+        return len(self.clients)
+
+    def rotation(self):
+        """Return the clients, starting from the next one in turn."""
+        k = next(self._turn) % len(self.clients)
+        return self.clients[k:] + self.clients[:k]
+
+
 class Connection(object):
 
-    def __init__(self, connection_string):
+    def __init__(self, connection_string, admission=None):
 
         # Build a map from the connection string supplied using the SQLAlchemy URI
         # and supplied properties. The format is generated from DremioDialect_flight.create_connect_args()
@@ -76,9 +200,32 @@ class Connection(object):
 
         # Enabling cookie middleware for stateful connectivity.
         client_cookie_middleware = CookieMiddlewareFactory()
-
-        client = flight.FlightClient('grpc+{0}://{1}:{2}'.format(protocol, properties['HOST'], properties['PORT']),
-            middleware=[client_cookie_middleware], **connection_args)
+        middleware = [client_cookie_middleware]
+
+        # Record per-RPC metrics into the process-wide flight_middleware.flight_metrics.
+        metrics_middleware = None
+        if 'EnableMetrics' in properties and properties['EnableMetrics'].lower() == 'true':
+            metrics_middleware = MetricsMiddlewareFactory()
+            middleware.append(metrics_middleware)
+
+        # gRPC channel tuning: message size limits, keepalive and raw channel arguments.
+        generic_options = channel_options(properties)
+        if generic_options:
+            connection_args['generic_options'] = generic_options
+
+        # Channels=K opens K clients sharing the middleware, and so the
+        # cookies, and the authentication headers of the call options.
+        channels = _int_property(properties, 'Channels') if 'Channels' in properties else 1
+        if channels < 1:
+            raise Error('Channels must be at least 1, got {0}'.format(channels))
+        if channels > 1:
+            # Without a subchannel pool of their own, gRPC would carry all the
+            # channels over one shared connection.
+            connection_args['generic_options'] = generic_options + [('grpc.use_local_subchannel_pool', 1)]
+
+        location = 'grpc+{0}://{1}:{2}'.format(protocol, properties['HOST'], properties['PORT'])
+        clients = [flight.FlightClient(location, middleware=middleware, **connection_args) for _ in range(channels)]
+        client = clients[0]
         
         # Authenticate either using basic username/password or using the Token parameter.
         headers = []
@@ -98,12 +245,46 @@ class Connection(object):
         add_header(properties, headers, 'routing_tag')
         add_header(properties, headers, 'quoting')
         add_header(properties, headers, 'routing_engine')
+        if metrics_middleware is not None:
+            metrics_middleware.headers = headers
+
+        # An AdmissionController shared with the other connections of the
+        # engine, capping the queries in flight per routing queue or engine.
+        self.admission = admission
+        # The schema context unqualified names resolve in, if any.
+        self.default_schema = properties.get('Schema')
+        self._routing = {name.decode('utf-8'): value.decode('utf-8') for name, value in headers
+                         if name != b'authorization'}
 
         self.flightclient = client
-        self.options = flight.FlightCallOptions(headers=headers)
+        self.channels = ChannelPool(clients)
+        self.retry_policy = retry_policy(properties)
+        # Decoding=cell converts each cell as it is read instead of a column
+        # of a batch at a time; see rows.table_rows.
+        self.decoding = properties.get('Decoding', 'column').lower()
+        check_decoding(self.decoding)
+        # String columns with at most this fraction of distinct values decode
+        # to one shared object per value; 0 turns client-side encoding off.
+        self.dictionary_threshold = (_float_property(properties, 'DictionaryThreshold')
+                                     if 'DictionaryThreshold' in properties else DEFAULT_DICTIONARY_THRESHOLD)
+        self.conversion = conversion_policy(properties)
+        # The Arrow memory the client allocates for the results of this
+        # connection comes from its own pool; see Cursor.memory_pool.
+        self.memory_pool = memory_pool(properties)
+        # Caps on the result of each query; see Cursor.max_result_bytes.
+        self.max_result_bytes = (_int_property(properties, 'MaxResultBytes')
+                                 if 'MaxResultBytes' in properties else None)
+        self.max_result_rows = _int_property(properties, 'MaxResultRows') if 'MaxResultRows' in properties else None
+        # The server picks the codec of the streams it sends and the reader
+        # decompresses them on Arrow's thread pool.
+        self._headers = headers
+        self._call_options = {}
+        self.options = self.call_options()
 
         self.closed = False
-        self.cursors = []
+        # Cursors are held weakly: one dropped by its user is freed with its
+        # results, and only those still alive are closed with the connection.
+        self.cursors = weakref.WeakSet()
 
     @check_closed
     def rollback(self):
@@ -113,28 +294,70 @@ class Connection(object):
     def close(self):
         """Close the connection now."""
         self.closed = True
-        for cursor in self.cursors:
+        for cursor in list(self.cursors):
             try:
                 cursor.close()
             except Error:
                 pass  # already closed
+        for client in self.channels.clients:
+            client.close()
 
     @check_closed
     def commit(self):
         pass
 
+    def call_options(self, headers=None):
+        """
+        Return the FlightCallOptions for calls with the Dremio `headers`
+        (e.g. `{'routing_queue': 'large'}`) replacing those of the connection.
+        The options are built once per distinct set of headers.
+        """
+        key = tuple(sorted((name.lower(), str(value)) for name, value in headers.items())) if headers else ()
+        options = self._call_options.get(key)
+        if options is None:
+            overrides = [(name.encode('utf-8'), value.encode('utf-8')) for name, value in key]
+            names = set(name for name, _ in overrides)
+            merged = [header for header in self._headers if header[0] not in names] + overrides
+            options = self._call_options.setdefault(
+                key, flight.FlightCallOptions(headers=merged))
+        return options
+
     @check_closed
-    def cursor(self):
-        """Return a new Cursor Object using the connection."""
-        cursor = Cursor(self.flightclient, self.options)
-        self.cursors.append(cursor)
+    def cursor(self, headers=None, streaming=False):
+        """
+        Return a new Cursor Object using the connection. `headers` override the
+        connection's Dremio headers (Schema, routing_queue, routing_tag,
+        routing_engine, quoting) for the queries of this cursor. A `streaming`
+        cursor reads results a record batch at a time as rows are fetched.
+        """
+        cursor = Cursor(self.flightclient, self.call_options(headers), self.channels, self.retry_policy)
+        cursor.decoding = self.decoding
+        cursor.dictionary_threshold = self.dictionary_threshold
+        cursor.conversion = self.conversion
+        cursor.memory_pool = self.memory_pool
+        cursor.max_result_bytes = self.max_result_bytes
+        cursor.max_result_rows = self.max_result_rows
+        cursor.streaming = streaming
+        if self.admission is not None:
+            routing = dict(self._routing, **{name.lower(): str(value) for name, value in (headers or {}).items()})
+            cursor.admission = self.admission
+            cursor.admission_key = admission_key(routing)
+        self.cursors.add(cursor)
 
         return cursor
 
     @check_closed
-    def execute(self, query):
+    def execute(self, query, params=None):
+        cursor = self.cursor()
+        return cursor.execute(query, params)
+
+    @check_closed
+    def export_query(self, query, path, format='parquet', params=None, rows_per_file=None, **options):
+        """Run `query` and write its results to a file; see `Cursor.export`."""
+        check_format(format, options)
         cursor = self.cursor()
-        return cursor.execute(query)
+        cursor.execute(query, params)
+        return cursor.export(path, format, rows_per_file, **options)
 
     def __enter__(self):
         return self
@@ -147,9 +370,41 @@ class Connection(object):
 class Cursor(object):
     """Connection cursor."""
 
-    def __init__(self, flightclient=None, options=None):
+    def __init__(self, flightclient=None, options=None, channels=None, retry_policy=None):
         self.flightclient = flightclient
         self.options = options
+        self.channels = channels
+        self.retry_policy = retry_policy
+
+        # Set by the connection when queries pass an AdmissionController;
+        # waiting queries with a higher priority are admitted first.
+        self.admission = None
+        self.admission_key = None
+        self.priority = 0
+
+        # How fetched rows convert their cells to Python: 'column' decodes a
+        # column of a record batch the first time any of its rows reads it,
+        # 'cell' converts each cell as it is read and keeps nothing.
+        self.decoding = 'column'
+        # Dictionary-encoded columns, and string or binary columns with at
+        # most this fraction of distinct values, decode each value once.
+        self.dictionary_threshold = DEFAULT_DICTIONARY_THRESHOLD
+        # How decimals, timestamps, binary and unsigned integers are
+        # converted; the description reflects the casts.
+        self.conversion = ConversionPolicy()
+        # The Arrow memory pool casts and decoding allocate from, through a
+        # pool of each query's own whose use is reported in `stats`; None is
+        # Arrow's default pool.
+        self.memory_pool = None
+        # A result with more bytes (Arrow buffer size) or rows than these is
+        # cancelled as it is read, raising OperationalError; None is no cap.
+        self.max_result_bytes = None
+        self.max_result_rows = None
+
+        # A streaming cursor reads the result of a query one record batch at
+        # a time as rows are fetched, like a server-side cursor, instead of
+        # all at the first fetch.
+        self.streaming = False
 
         # This read/write attribute specifies the number of rows to fetch at a
         # time with .fetchmany(). It defaults to 1 meaning to fetch a single
@@ -161,27 +416,262 @@ class Cursor(object):
         # this is updated only after a query
         self.description = None
 
-        # this is set to a list of rows after a successful query
+        # The result of the last query goes through these states: the
+        # FlightInfo of a read-only query whose streams are not read yet, the
+        # pa.Table read, then the rows converted from it and not fetched yet.
+        # A streaming cursor reads `_batches` instead of a table, converting
+        # them to rows as they are fetched.
+        self._info = None
+        self._table = None
+        self._batches = None
         self._results = None
+        self._schema = None
+        self._policy = None
+        self._limit = None
+        self._pool = None
+        self._start = None
+        self._holds_admission = False
+
+        # this is set to the QueryStats of the last query
+        self.stats = None
 
     @property
     @check_result
     @check_closed
     def rowcount(self):
-        return len(self._results)
+        # A streaming cursor knows the count only at the end of the result.
+        if self._batches is not None or (self.streaming and self._info is not None):
+            return -1
+        return len(self._rows())
 
     @check_closed
     def close(self):
-        """Close the cursor."""
+        """Close the cursor, cancelling a stream being read and freeing the result."""
         self.closed = True
+        self._reset()
+
+    def __del__(self):
+        # A cursor dropped without being closed gives back its admission slot.
+        self._release()
+
+    def _reset(self):
+        if self._batches is not None:
+            # Closing the iterator cancels the stream being read.
+            self._batches.close()
+        self._info = self._table = self._batches = self._results = self._schema = None
+        self._release()
 
     @check_closed
     def execute(self, query, params=None):
+        check_decoding(self.decoding)
         self.description = None
-        self._results, self.description = execute(
-            query, self.flightclient, self.options)
+        self._reset()
+        # Dremio has no bind parameters, so values are inlined as literals. A
+        # read with a large IN list bound by the 'chunk' strategy is run once
+        # per chunk of the list, and the results concatenated.
+        chunks = [query]
+        if params is not None:
+            chunks = [render_pyformat(query, chunk)
+                      for chunk in (split_in_lists(params) if is_read_only(query) else [params])]
+            query = chunks[0]
+        self.stats = QueryStats()
+        self._start = time.perf_counter()
+        self._policy = retry_policy_for(query, self.retry_policy)
+        self._limit = self._result_limit()
+        self._pool = pa.proxy_memory_pool(self.memory_pool or pa.default_memory_pool())
+        if len(chunks) == 1:
+            self._acquire()
+        try:
+            data_clients = self._data_clients()
+            hedge_client = data_clients[1] if data_clients else None
+            if len(chunks) > 1:
+                # Each chunk is admitted like a statement of its own, so the
+                # caps bound the Dremio jobs a chunked statement starts.
+                info = get_chunked_flight_info(chunks, self.flightclient, self.options, self.stats, self._policy,
+                                               hedge_client, self._admitted if self.admission is not None else None)
+            else:
+                info = get_flight_info(query, self.flightclient, self.options, self.stats, self._policy,
+                                       hedge_client)
+            if is_read_only(query) and info.schema.names:
+                # Dremio runs a query when its stream is requested, so a read is
+                # deferred to the first fetch, or handed over as an Arrow stream,
+                # and admitted again then.
+                self._info = info
+                self._schema = info.schema
+            else:
+                self._table = read_table(info, self.flightclient, self.options, self.stats, data_clients,
+                                         self._policy, self._limit)
+                self._schema = self._table.schema
+        finally:
+            # No slot is held between execute and the read, so cursors not
+            # fetched yet do not keep others from being admitted.
+            self._release()
+        self.description = describe(self.conversion.schema(self._schema))
         return self
 
+    def _result_limit(self):
+        if self.max_result_bytes is None and self.max_result_rows is None:
+            return None
+        return ResultLimit(self.max_result_bytes, self.max_result_rows)
+
+    def _data_clients(self):
+        return self.channels.rotation() if self.channels and len(self.channels) > 1 else None
+
+    def _acquire(self):
+        if self.admission is not None:
+            queued_ms = self.admission.acquire(self.admission_key, self.priority)
+            self.stats.queued_ms = (self.stats.queued_ms or 0.0) + queued_ms
+            self._holds_admission = True
+
+    @contextlib.contextmanager
+    def _admitted(self, stats):
+        """Hold an admission slot of its own, recording the wait in the QueryStats `stats`."""
+        stats.queued_ms = self.admission.acquire(self.admission_key, self.priority)
+        try:
+            yield
+        finally:
+            self.admission.release(self.admission_key)
+
+    def _release(self):
+        """Give back the admission slot once the result is read or dropped."""
+        if self._holds_admission:
+            self._holds_admission = False
+            self.admission.release(self.admission_key)
+
+    def _rows(self):
+        """Return the remaining rows, reading and converting the result first if needed."""
+        if self._info is not None:
+            self._acquire()
+            info, self._info = self._info, None
+            try:
+                self._table = read_table(info, self.flightclient, self.options, self.stats,
+                                         self._data_clients(), self._policy, self._limit)
+            except Exception:
+                # Later fetches return no rows.
+                self._results = collections.deque()
+                raise
+            finally:
+                self._release()
+        if self._table is not None:
+            table, self._table = self._table, None
+            self._results = collections.deque(self._to_rows(table))
+            self._finish()
+        return self._results
+
+    def _to_rows(self, table):
+        return to_rows(table, self.stats, self.decoding, self.dictionary_threshold, self.conversion, self._pool)
+
+    def _finish(self):
+        self.stats.total_ms = (time.perf_counter() - self._start) * 1000.0
+        self.stats.pool_bytes = self._pool.bytes_allocated()
+        self.stats.pool_peak_bytes = self._pool.max_memory()
+        log_stats(self.stats)
+
+    def _fill(self, size):
+        """Convert streamed batches to rows until `size` rows, or all if None, are ready."""
+        while self._batches is not None and (size is None or len(self._results) < size):
+            try:
+                batch = next(self._batches, None)
+            except Exception:
+                # The stream is cancelled; later fetches return no rows.
+                self._batches = None
+                self._results = collections.deque()
+                raise
+            if batch is None:
+                self._batches = None
+                self._finish()
+            elif batch.num_rows:
+                self._results.extend(self._to_rows(pa.Table.from_batches([batch])))
+
+    def _fetch(self, size=None):
+        """Remove and return the next `size` rows, or all the remaining rows if None."""
+        if self.streaming and self._info is not None:
+            # The slot is held until the stream is exhausted or closed.
+            self._acquire()
+            info, self._info = self._info, None
+            _, self._batches = stream_batches(info, self.flightclient, self.options, self.stats,
+                                              on_close=self._release, limit=self._limit,
+                                              data_clients=self._data_clients())
+            self._results = collections.deque()
+        if self._batches is not None:
+            self._fill(size)
+        results = self._rows()
+        if size is None or size >= len(results):
+            self._results = collections.deque()
+            return list(results)
+        return [results.popleft() for _ in range(size)]
+
+    @check_result
+    @check_closed
+    def __arrow_c_schema__(self):
+        """Export the schema of the result through the Arrow PyCapsule interface."""
+        return self._schema.__arrow_c_schema__()
+
+    @check_result
+    @check_closed
+    def __arrow_c_stream__(self, requested_schema=None):
+        """
+        Export the result as an Arrow C stream, e.g. to `pyarrow.table(cursor)`,
+        `polars.from_arrow(cursor)` or DuckDB. A result not fetched yet is
+        streamed live from Flight; it is consumed either way, and later fetches
+        return no rows.
+        """
+        schema, batches = self._stream()
+        reader = pa.RecordBatchReader.from_batches(schema, batches)
+        return reader.__arrow_c_stream__(requested_schema)
+
+    def _stream(self):
+        """Hand over the result as its Arrow schema and an iterator over its record batches."""
+        if self._info is not None:
+            self._acquire()
+            info, self._info = self._info, None
+            schema, batches = stream_batches(info, self.flightclient, self.options, self.stats,
+                                             on_close=self._end_stream, limit=self._limit,
+                                             data_clients=self._data_clients())
+        elif self._table is not None:
+            table, self._table = self._table, None
+            schema, batches = table.schema, iter(table.to_batches())
+            self._finish()
+        else:
+            raise Error('The result has already been fetched as rows')
+        self._results = collections.deque()
+        return schema, batches
+
+    def _end_stream(self):
+        """Called once a stream handed over by `_stream` is exhausted or closed."""
+        self._release()
+        self._finish()
+
+    @check_result
+    @check_closed
+    def export(self, path, format='parquet', rows_per_file=None, **options):
+        """
+        Write the result of the last `execute` to `path` as 'parquet', 'csv'
+        or 'arrow' (IPC file). Record batches go from the Flight stream
+        straight to the file, one at a time, without creating Python rows.
+        The result is consumed, as by a fetch, and counts against the result
+        caps.
+
+        `rows_per_file` splits the output over several files, named by
+        replacing `{part}` in `path` or appending a part number to it.
+        `row_group_size` (rows) and `compression` are passed to the Parquet
+        writer; `compression` ('lz4' or 'zstd') also applies to Arrow files.
+        Other options raise NotSupportedError, leaving the result unread.
+
+        Returns the list of paths written. `stats` holds the query statistics.
+        """
+        check_format(format, options)
+        schema, batches = self._stream()
+        try:
+            paths = export_batches(schema, batches, path, format, rows_per_file, **options)
+        finally:
+            # Cancels the stream, and gives back its admission slot, when the
+            # writer failed before the end.
+            close = getattr(batches, 'close', None)
+            if close is not None:
+                close()
+        return paths
+
     @check_closed
     def executemany(self, query):
         raise NotSupportedError(
@@ -194,10 +684,8 @@ class Cursor(object):
         Fetch the next row of a query result set, returning a single sequence,
         or `None` when no more data is available.
         """
-        try:
-            return self._results.pop(0)
-        except IndexError:
-            return None
+        rows = self._fetch(1)
+        return rows[0] if rows else None
 
     @check_result
     @check_closed
@@ -207,10 +695,7 @@ class Cursor(object):
         sequences (e.g. a list of tuples). An empty sequence is returned when
         no more rows are available.
         """
-        size = size or self.arraysize
-        out = self._results[:size]
-        self._results = self._results[size:]
-        return out
+        return self._fetch(size or self.arraysize)
 
     @check_result
     @check_closed
@@ -220,9 +705,7 @@ class Cursor(object):
         sequence of sequences (e.g. a list of tuples). Note that the cursor's
         arraysize attribute can affect the performance of this operation.
         """
-        out = self._results[:]
-        self._results = []
-        return out
+        return self._fetch()
 
     @check_closed
     def setinputsizes(self, sizes):
@@ -234,6 +717,7 @@ class Cursor(object):
         # not supported
         pass
 
+    @check_result
     @check_closed
     def __iter__(self):
-        return iter(self._results)
+        return iter(self.fetchone, None)
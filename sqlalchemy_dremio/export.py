@@ -0,0 +1,154 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+
+import pyarrow as pa
+
+from sqlalchemy_dremio.exceptions import NotSupportedError
+
+FORMATS = ('parquet', 'csv', 'arrow')
+
+# Rows per Parquet row group unless given; pyarrow's own default.
+DEFAULT_ROW_GROUP_SIZE = 1024 * 1024
+
+
+class _ParquetWriter(object):
+    """
+    Writes row groups of `row_group_size` rows, buffering up to a row group
+    and a batch: writing each small Flight batch as it comes would make as
+    many tiny row groups.
+    """
+
+    def __init__(self, path, schema, row_group_size=None, compression='snappy'):
+        import pyarrow.parquet as pq
+
+        self._writer = pq.ParquetWriter(path, schema, compression=compression)
+        self._schema = schema
+        self._row_group_size = row_group_size or DEFAULT_ROW_GROUP_SIZE
+        self._pending = []
+        self._pending_rows = 0
+
+    def write(self, batch):
+        self._pending.append(batch)
+        self._pending_rows += batch.num_rows
+        if self._pending_rows >= self._row_group_size:
+            # Write whole row groups and keep the remainder for the next one.
+            table = pa.Table.from_batches(self._pending, schema=self._schema)
+            full = self._pending_rows - self._pending_rows % self._row_group_size
+            self._writer.write_table(table.slice(0, full), row_group_size=self._row_group_size)
+            self._pending = table.slice(full).to_batches()
+            self._pending_rows -= full
+
+    def _flush(self):
+        if self._pending_rows:
+            table = pa.Table.from_batches(self._pending, schema=self._schema)
+            self._writer.write_table(table, row_group_size=self._row_group_size)
+        self._pending = []
+        self._pending_rows = 0
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+class _CsvWriter(object):
+
+    def __init__(self, path, schema):
+        import pyarrow.csv as csv
+
+        self._writer = csv.CSVWriter(path, schema)
+
+    def write(self, batch):
+        self._writer.write_batch(batch)
+
+    def close(self):
+        self._writer.close()
+
+
+class _ArrowWriter(object):
+    """Writes the Arrow IPC file format, optionally lz4 or zstd compressed."""
+
+    def __init__(self, path, schema, compression=None):
+        self._writer = pa.ipc.new_file(path, schema, options=pa.ipc.IpcWriteOptions(compression=compression))
+
+    def write(self, batch):
+        self._writer.write_batch(batch)
+
+    def close(self):
+        self._writer.close()
+
+
+_writers = {'parquet': _ParquetWriter, 'csv': _CsvWriter, 'arrow': _ArrowWriter}
+
+# The options each writer takes.
+_options = {'parquet': ('row_group_size', 'compression'), 'csv': (), 'arrow': ('compression',)}
+
+
+def check_format(format, options=()):
+    """Raise NotSupportedError for an unknown `format` or writer `options` it does not take."""
+    if format not in _writers:
+        raise NotSupportedError('Unsupported export format {0!r}, use one of {1}'.format(format, ', '.join(FORMATS)))
+    unsupported = sorted(set(options) - set(_options[format]))
+    if unsupported:
+        raise NotSupportedError('Unsupported {0} export options: {1}'.format(format, ', '.join(unsupported)))
+
+
+def part_path(path, part):
+    """
+    Return the path of file number `part` of a split export: `path` with
+    `{part}` replaced, or with `-<part>` inserted before its extension.
+    """
+    if '{part}' in path:
+        return path.replace('{part}', str(part))
+    root, ext = os.path.splitext(path)
+    return '{0}-{1:05d}{2}'.format(root, part, ext)
+
+
+def export_batches(schema, batches, path, format='parquet', rows_per_file=None, **options):
+    """
+    Write record `batches` of `schema` to `path` in `format` ('parquet',
+    'csv' or 'arrow'), one batch at a time.
+
+    With `rows_per_file`, each file holds that many rows (the last one the
+    rest) and the files are named by `part_path`. Other options go to the writer: `row_group_size` and
+    `compression` for Parquet, `compression` for Arrow.
+
+    Returns the paths written.
+    """
+    check_format(format, options)
+    make_writer = _writers[format]
+
+    paths = []
+    writer = None
+    rows_in_file = 0
+    try:
+        for batch in batches:
+            while True:
+                if writer is None or (rows_per_file and rows_in_file >= rows_per_file):
+                    if writer is not None:
+                        writer.close()
+                    paths.append(part_path(path, len(paths)) if rows_per_file else path)
+                    writer = make_writer(paths[-1], schema, **options)
+                    rows_in_file = 0
+                if rows_per_file and rows_in_file + batch.num_rows > rows_per_file:
+                    # Split the batch over this file and the next.
+                    head = rows_per_file - rows_in_file
+                    writer.write(batch.slice(0, head))
+                    rows_in_file += head
+                    batch = batch.slice(head)
+                    continue
+                writer.write(batch)
+                rows_in_file += batch.num_rows
+                break
+
+        # An empty result still gets a file with the schema.
+        if writer is None:
+            paths.append(part_path(path, 0) if rows_per_file else path)
+            writer = make_writer(paths[-1], schema, **options)
+    finally:
+        if writer is not None:
+            writer.close()
+    return paths
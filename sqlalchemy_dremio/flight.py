@@ -1,11 +1,30 @@
+import logging
 import re
 
 from sqlalchemy import schema, types, pool
 from sqlalchemy.engine import default, reflection
-from sqlalchemy.sql import compiler
+from sqlalchemy.sql import compiler, elements, functions, operators, selectable, visitors
+
+from sqlalchemy_dremio.admission import DEFAULT_TIMEOUT, AdmissionController, parse_limits
+from sqlalchemy_dremio.exceptions import NotSupportedError
+from sqlalchemy_dremio.params import InList, render_literal
+
+logger = logging.getLogger(__name__)
 
 _dialect_name = "dremio+flight"
 
+# How `column.in_(values)` is compiled with more values than the dialect's
+# in_list_threshold: 'expand' binds each value, as SQLAlchemy does; 'values'
+# inlines them as a VALUES derived table; 'chunk' splits them over
+# in_list_chunks statements, planned and run concurrently, and concatenates
+# the results.
+IN_LIST_STRATEGIES = ('expand', 'values', 'chunk')
+
+DEFAULT_IN_LIST_THRESHOLD = 1000
+DEFAULT_IN_LIST_CHUNKS = 4
+# Each chunk is a Dremio job of its own.
+MAX_IN_LIST_CHUNKS = 32
+
 _type_map = {
     'boolean': types.BOOLEAN,
     'BOOLEAN': types.BOOLEAN,
@@ -40,14 +59,110 @@ _type_map = {
 }
 
 
+def _glob_to_like(pattern):
+    """Translate a shell-style glob (`*`, `?`) into a quoted SQL LIKE pattern."""
+    like = []
+    for char in pattern:
+        if char == '*':
+            like.append('%')
+        elif char == '?':
+            like.append('_')
+        elif char in ('%', '_', '\\'):
+            like.append('\\' + char)
+        elif char == "'":
+            like.append("''")
+        else:
+            like.append(char)
+    return "'" + "".join(like) + "'"
+
+
+def _glob_filter_clauses(column, include, exclude):
+    """Build WHERE clauses keeping values of `column` that match any `include`
+    glob and none of the `exclude` globs."""
+    clauses = []
+    if include:
+        clauses.append("(" + " OR ".join(
+            "{0} LIKE {1} ESCAPE '\\'".format(column, _glob_to_like(p)) for p in include) + ")")
+    for p in exclude:
+        clauses.append("{0} NOT LIKE {1} ESCAPE '\\'".format(column, _glob_to_like(p)))
+    return clauses
+
+
+def _split_patterns(value):
+    return [p.strip() for p in value.split(',') if p.strip()]
+
+
+def _dbapi_connection(connection):
+    """Return the `db.Connection` behind a SQLAlchemy connection, if any."""
+    from sqlalchemy_dremio.db import Connection
+
+    fairy = getattr(connection, 'connection', None)
+    # SQLAlchemy 1.4+ exposes the raw connection as dbapi_connection, 1.3 as connection.
+    for attr in ('dbapi_connection', 'connection'):
+        raw = getattr(fairy, attr, None)
+        if isinstance(raw, Connection):
+            return raw
+    return None
+
+
 class DremioExecutionContext(default.DefaultExecutionContext):
     pass
 
 
+def _conjuncts(clause):
+    if isinstance(clause, elements.BooleanClauseList) and clause.operator is operators.and_:
+        return [term for c in clause.clauses for term in _conjuncts(c)]
+    return [clause]
+
+
+def _chunkable(statement, parameter):
+    """
+    Return whether the results of `statement` run over parts of the IN list
+    `parameter` concatenate to its result: `parameter` filters a plain SELECT,
+    without aggregates, window functions, grouping, DISTINCT, ordering or
+    limits, as one of the terms ANDed in its WHERE clause.
+    """
+    if not isinstance(statement, selectable.Select) or statement.whereclause is None:
+        return False
+    if (statement._group_by_clauses or statement._having_criteria or statement._distinct
+            or statement._order_by_clauses or statement._limit_clause is not None
+            or statement._offset_clause is not None or statement._fetch_clause is not None):
+        return False
+    for column in statement.selected_columns:
+        if any(isinstance(e, (functions.FunctionElement, elements.Over)) for e in visitors.iterate(column)):
+            return False
+    return any(isinstance(term, elements.BinaryExpression) and term.operator is operators.in_op
+               and isinstance(term.right, elements.BindParameter) and term.right.key == parameter.key
+               for term in _conjuncts(statement.whereclause))
+
+
 class DremioCompiler(compiler.SQLCompiler):
     def visit_char_length_func(self, fn, **kw):
         return 'length{}'.format(self.function_argspec(fn, **kw))
 
+    def _literal_execute_expanding_parameter(self, name, parameter, values):
+        # Called as each statement with an expanding IN parameter runs, to
+        # render the values; large lists skip a bound parameter per value.
+        strategy = self.dialect.in_list_strategy
+        impl = parameter.type._unwrapped_dialect_impl(self.dialect)
+        if (strategy == 'expand' or len(values) <= self.dialect.in_list_threshold or parameter.literal_execute
+                or impl._is_tuple_type or impl._has_bind_expression):
+            return super(DremioCompiler, self)._literal_execute_expanding_parameter(name, parameter, values)
+
+        process = impl._cached_bind_processor(self.dialect)
+        if strategy == 'chunk' and process is None and _chunkable(self.statement, parameter):
+            # Bound as one value, which the cursor splits into chunks of the
+            # distinct values.
+            values = list(dict.fromkeys(values))
+            chunk_size = -(-len(values) // self.dialect.in_list_chunks)
+            return [(name, InList(values, chunk_size))], self.bindtemplate % {'name': name}
+
+        if process is not None:
+            values = [process(value) for value in values]
+        rows = ', '.join('({0})'.format(render_literal(value)) for value in values)
+        # The statement still goes through pyformat rendering.
+        return [], 'SELECT v FROM (VALUES {0}) AS in_values (v)'.format(rows.replace('%', '%%'))
+
     def visit_table(self, table, asfrom=False, **kwargs):
 
         if asfrom:
@@ -143,8 +258,43 @@ class DremioIdentifierPreparer(compiler.IdentifierPreparer):
             __init__(dialect, initial_quote='"', final_quote='"')
 
 
+# Execution options sent as Dremio headers with a single statement, overriding
+# the connection's Schema, routing_queue, ... properties.
+_header_execution_options = ('schema', 'routing_queue', 'routing_tag', 'routing_engine', 'quoting')
+
+# Execution options overriding the conversion policies of the connection.
+_conversion_execution_options = ('decimal_as', 'timestamp_as', 'binary_as', 'unsigned_as')
+
+
 class DremioExecutionContext_flight(DremioExecutionContext):
-    pass
+
+    def create_cursor(self):
+        headers = {name: self.execution_options[name] for name in _header_execution_options
+                   if self.execution_options.get(name) is not None}
+        # stream_results and yield_per get a streaming cursor, which reads the
+        # Flight stream a record batch at a time as rows are fetched.
+        self._is_server_side = self._use_server_side_cursor()
+        cursor = self._dbapi_connection.cursor(headers=headers or None, streaming=self._is_server_side)
+        # Admission priority; waiting statements with a higher one run first.
+        if self.execution_options.get('priority') is not None:
+            cursor.priority = self.execution_options['priority']
+        # How rows decode cells: 'column' (per batch, on first use) or 'cell'.
+        if self.execution_options.get('decoding') is not None:
+            cursor.decoding = self.execution_options['decoding']
+        if self.execution_options.get('dictionary_threshold') is not None:
+            cursor.dictionary_threshold = self.execution_options['dictionary_threshold']
+        # Conversion policies, e.g. execution_options(decimal_as='float').
+        conversions = {name[:-3]: self.execution_options[name] for name in _conversion_execution_options
+                       if self.execution_options.get(name) is not None}
+        if conversions:
+            cursor.conversion = cursor.conversion.replace(**conversions)
+        # Caps on the result, e.g. execution_options(max_result_rows=100000);
+        # passing one cancels the query with OperationalError.
+        if self.execution_options.get('max_result_bytes') is not None:
+            cursor.max_result_bytes = self.execution_options['max_result_bytes']
+        if self.execution_options.get('max_result_rows') is not None:
+            cursor.max_result_rows = self.execution_options['max_result_rows']
+        return cursor
 
 
 class DremioDialect_flight(default.DefaultDialect):
@@ -156,9 +306,37 @@ class DremioDialect_flight(default.DefaultDialect):
     poolclass = pool.SingletonThreadPool
     statement_compiler = DremioCompiler
     paramstyle = 'pyformat'
+    supports_statement_cache = True
+    supports_server_side_cursors = True
     ddl_compiler = DremioDDLCompiler
     preparer = DremioIdentifierPreparer
-    execution_ctx_cls = DremioExecutionContext
+    execution_ctx_cls = DremioExecutionContext_flight
+
+    # Glob patterns restricting the schemas and tables returned by reflection.
+    # Set from the include_schemas/exclude_schemas/include_tables/exclude_tables
+    # URL parameters as comma-separated lists.
+    include_schemas = []
+    exclude_schemas = []
+    include_tables = []
+    exclude_tables = []
+
+    # Reflect through the Flight SQL GetDbSchemas/GetTables commands rather
+    # than SQL jobs. Disabled with flight_sql_reflection=false, and switched
+    # off for the dialect the first time the server rejects a Flight SQL command.
+    flight_sql_reflection = True
+
+    # The AdmissionController shared by the engine's connections, created when
+    # MaxConcurrentQueries or QueueLimits is set.
+    admission = None
+
+    # IN lists of more than in_list_threshold values are compiled as
+    # in_list_strategy says; see IN_LIST_STRATEGIES. Set from the URL
+    # parameters of the same names. 'values' and 'chunk' change the SQL
+    # Dremio runs, so they are opt-in. 'chunk' applies to plain key lookups
+    # only, and other statements use 'values'.
+    in_list_strategy = 'expand'
+    in_list_threshold = DEFAULT_IN_LIST_THRESHOLD
+    in_list_chunks = DEFAULT_IN_LIST_CHUNKS
 
     def create_connect_args(self, url):
         opts = url.translate_connect_args(username='user')
@@ -188,6 +366,59 @@ class DremioDialect_flight(default.DefaultDialect):
         add_property(lc_query_dict, 'quoting', connectors)
         add_property(lc_query_dict, 'routing_engine', connectors)
         add_property(lc_query_dict, 'Token', connectors)
+        add_property(lc_query_dict, 'EnableMetrics', connectors)
+        add_property(lc_query_dict, 'MaxMessageSize', connectors)
+        add_property(lc_query_dict, 'KeepAliveTime', connectors)
+        add_property(lc_query_dict, 'KeepAliveTimeout', connectors)
+        add_property(lc_query_dict, 'KeepAliveWithoutCalls', connectors)
+        add_property(lc_query_dict, 'Channels', connectors)
+        add_property(lc_query_dict, 'MaxRetries', connectors)
+        add_property(lc_query_dict, 'RetryBackoff', connectors)
+        add_property(lc_query_dict, 'RetryBackoffMax', connectors)
+        add_property(lc_query_dict, 'HedgeAfter', connectors)
+        add_property(lc_query_dict, 'Decoding', connectors)
+        add_property(lc_query_dict, 'DictionaryThreshold', connectors)
+        add_property(lc_query_dict, 'DecimalAs', connectors)
+        add_property(lc_query_dict, 'TimestampAs', connectors)
+        add_property(lc_query_dict, 'BinaryAs', connectors)
+        add_property(lc_query_dict, 'UnsignedAs', connectors)
+        add_property(lc_query_dict, 'MemoryPool', connectors)
+        add_property(lc_query_dict, 'MaxResultBytes', connectors)
+        add_property(lc_query_dict, 'MaxResultRows', connectors)
+
+        # Raw gRPC channel arguments are passed through as-is.
+        for key, value in lc_query_dict.items():
+            if key.startswith('grpc.'):
+                connectors.append('{0}={1}'.format(key, value))
+
+        # Reflection filters apply to the dialect rather than to the connection.
+        for attr in ('include_schemas', 'exclude_schemas', 'include_tables', 'exclude_tables'):
+            if attr in lc_query_dict:
+                setattr(self, attr, _split_patterns(lc_query_dict[attr]))
+        if 'flight_sql_reflection' in lc_query_dict:
+            self.flight_sql_reflection = lc_query_dict['flight_sql_reflection'].lower() != 'false'
+
+        # So do the IN list strategy and threshold, used by the compiler.
+        if 'in_list_strategy' in lc_query_dict:
+            strategy = lc_query_dict['in_list_strategy'].lower()
+            if strategy not in IN_LIST_STRATEGIES:
+                raise NotSupportedError('Unsupported in_list_strategy {0!r}, use one of {1}'.format(
+                    strategy, ', '.join(IN_LIST_STRATEGIES)))
+            self.in_list_strategy = strategy
+        if 'in_list_threshold' in lc_query_dict:
+            self.in_list_threshold = int(lc_query_dict['in_list_threshold'])
+        if 'in_list_chunks' in lc_query_dict:
+            self.in_list_chunks = min(max(1, int(lc_query_dict['in_list_chunks'])), MAX_IN_LIST_CHUNKS)
+
+        # Admission control is shared by every connection of the engine.
+        if 'maxconcurrentqueries' in lc_query_dict or 'queuelimits' in lc_query_dict:
+            default_limit = lc_query_dict.get('maxconcurrentqueries')
+            timeout = int(lc_query_dict.get('admissiontimeout', DEFAULT_TIMEOUT * 1000))
+            self.admission = AdmissionController(
+                default_limit=int(default_limit) if default_limit else None,
+                limits=parse_limits(lc_query_dict.get('queuelimits', '')),
+                timeout=timeout / 1000.0 if timeout else None)
+            connect_args['admission'] = self.admission
 
         return [[";".join(connectors)], connect_args]
 
@@ -212,7 +443,37 @@ class DremioDialect_flight(default.DefaultDialect):
     def get_foreign_keys(self, connection, table_name, schema=None, **kw):
         return []
 
+    def _reflect_with_flight_sql(self, connection, fn):
+        """
+        Call `fn` with a `FlightSqlCatalog` for `connection`. Returns None when
+        Flight SQL reflection is disabled or fails, so the caller falls back to
+        running SQL.
+        """
+        if not self.flight_sql_reflection:
+            return None
+        dbapi_connection = _dbapi_connection(connection)
+        if dbapi_connection is None:
+            return None
+
+        from sqlalchemy_dremio import flightsql
+
+        try:
+            return fn(flightsql.FlightSqlCatalog(dbapi_connection.flightclient, dbapi_connection.options,
+                                                 dbapi_connection.default_schema))
+        except flightsql.CATALOG_ERRORS as e:
+            if flightsql.is_unsupported(e):
+                logger.info('Flight SQL catalog commands are not supported, reflecting with SQL: %s', e)
+                self.flight_sql_reflection = False
+            else:
+                logger.debug('Flight SQL catalog command failed, reflecting with SQL: %s', e)
+            return None
+
     def get_columns(self, connection, table_name, schema, **kw):
+        result = self._reflect_with_flight_sql(
+            connection, lambda catalog: self._flight_sql_columns(catalog, table_name, schema))
+        if result is not None:
+            return result
+
         sql = "DESCRIBE \"{0}\"".format(table_name)
         if schema != None and schema != "":
             sql = "DESCRIBE \"{0}\".\"{1}\"".format(schema, table_name)
@@ -231,23 +492,74 @@ class DremioDialect_flight(default.DefaultDialect):
             result.append(column)
         return (result)
 
+    def _flight_sql_columns(self, catalog, table_name, schema):
+        from sqlalchemy_dremio.flightsql import arrow_type_name
+
+        # An unqualified name is looked up in the connection's schema context.
+        # Unless that finds exactly one table, leave it to DESCRIBE to resolve
+        # the name the way the server does.
+        tables = catalog.get_tables(schema=schema or catalog.default_schema, table_name=table_name,
+                                    include_schema=True)
+        if not schema and len(tables) != 1:
+            return None
+        if not tables:
+            return []
+        result = []
+        for field in tables[0][2]:
+            column = {
+                "name": field.name,
+                "type": _type_map.get(arrow_type_name(field.type), types.VARCHAR),
+                "default": None,
+                "comment": None,
+                "nullable": field.nullable
+            }
+            result.append(column)
+        return result
+
     @reflection.cache
     def get_table_names(self, connection, schema, **kw):
+        result = self._reflect_with_flight_sql(connection, lambda catalog: [
+            name for _, name, _ in catalog.get_tables(
+                schema=schema, include_schemas=self.include_schemas, exclude_schemas=self.exclude_schemas,
+                include_tables=self.include_tables, exclude_tables=self.exclude_tables)])
+        if result is not None:
+            return result
+
         sql = 'SELECT TABLE_NAME FROM INFORMATION_SCHEMA."TABLES"'
         if schema is not None:
-            sql = "SELECT TABLE_NAME FROM INFORMATION_SCHEMA.\"TABLES\" WHERE TABLE_SCHEMA = '" + schema + "'"
+            clauses = ["TABLE_SCHEMA = '" + schema + "'"]
+        else:
+            clauses = _glob_filter_clauses('TABLE_SCHEMA', self.include_schemas, self.exclude_schemas)
+        clauses += _glob_filter_clauses('TABLE_NAME', self.include_tables, self.exclude_tables)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
 
         result = connection.execute(sql)
         table_names = [r[0] for r in result]
         return table_names
 
     def get_schema_names(self, connection, schema=None, **kw):
-        result = connection.execute("SHOW SCHEMAS")
+        result = self._reflect_with_flight_sql(
+            connection, lambda catalog: catalog.get_schema_names(self.include_schemas, self.exclude_schemas))
+        if result is not None:
+            return result
+
+        clauses = _glob_filter_clauses('SCHEMA_NAME', self.include_schemas, self.exclude_schemas)
+        if clauses:
+            result = connection.execute(
+                'SELECT SCHEMA_NAME FROM INFORMATION_SCHEMA.SCHEMATA WHERE ' + " AND ".join(clauses))
+        else:
+            result = connection.execute("SHOW SCHEMAS")
         schema_names = [r[0] for r in result]
         return schema_names
 
     @reflection.cache
     def has_table(self, connection, table_name, schema=None, **kw):
+        result = self._reflect_with_flight_sql(connection, lambda catalog: len(catalog.get_tables(
+            schema=schema or None, table_name=str(table_name))) > 0)
+        if result is not None:
+            return result
+
         sql = 'SELECT COUNT(*) FROM INFORMATION_SCHEMA."TABLES"'
         sql += " WHERE TABLE_NAME = '" + str(table_name) + "'"
         if schema is not None and schema != "":
@@ -1,13 +1,24 @@
+import threading
+import time
+import weakref
+
+from pyarrow import flight
 from pyarrow.flight import ClientMiddleware
 from pyarrow.flight import ClientMiddlewareFactory
 from http.cookies import SimpleCookie
 
 
 class CookieMiddlewareFactory(ClientMiddlewareFactory):
-    """A factory that creates CookieMiddleware(s)."""
+    """
+    A factory that creates CookieMiddleware(s).
+
+    The cookie jar is shared by every call on the client, which may run on
+    several threads at once, so it is only touched under `lock`.
+    """
 
     def __init__(self):
         self.cookies = {}
+        self.lock = threading.Lock()
 
     def start_call(self, info):
         return CookieMiddleware(self)
@@ -32,10 +43,266 @@ class CookieMiddleware(ClientMiddleware):
                 for item in headers.get(key):
                     cookie.load(item)
 
-                self.factory.cookies.update(cookie.items())
+                with self.factory.lock:
+                    self.factory.cookies.update(cookie.items())
 
     def sending_headers(self):
-        if self.factory.cookies:
-            cookie_string = '; '.join("{!s}={!s}".format(key, val.value) for (key, val) in self.factory.cookies.items())
+        with self.factory.lock:
+            cookies = list(self.factory.cookies.items())
+        if cookies:
+            cookie_string = '; '.join("{!s}={!s}".format(key, val.value) for (key, val) in cookies)
             return {b'cookie': cookie_string.encode('utf-8')}
         return {}
+
+
+# gRPC status codes of the errors pyarrow raises for failed Flight calls.
+_STATUS_CODES = (
+    (flight.FlightCancelledError, 'CANCELLED'),
+    (flight.FlightUnauthenticatedError, 'UNAUTHENTICATED'),
+    (flight.FlightUnauthorizedError, 'PERMISSION_DENIED'),
+    (flight.FlightTimedOutError, 'DEADLINE_EXCEEDED'),
+    (flight.FlightUnavailableError, 'UNAVAILABLE'),
+    (flight.FlightInternalError, 'INTERNAL'),
+    (flight.FlightServerError, 'UNKNOWN'),
+    (NotImplementedError, 'UNIMPLEMENTED'),
+)
+
+
+def _status_code(exception):
+    if exception is None:
+        return 'OK'
+    for error_class, code in _STATUS_CODES:
+        if isinstance(exception, error_class):
+            return code
+    return 'UNKNOWN'
+
+
+def _headers_size(headers):
+    size = 0
+    for key, values in headers.items():
+        for value in values:
+            size += len(key) + len(value)
+    return size
+
+
+class _MetricsShard(object):
+    """Counters updated by a single thread only."""
+
+    def __init__(self, bucket_count):
+        self.bucket_count = bucket_count
+        # (method, status) -> number of calls
+        self.calls = {}
+        # method -> [count per latency bucket..., sum of seconds]
+        self.latency = {}
+        # method -> bytes of headers and trailers received
+        self.received_header_bytes = {}
+        # method -> bytes of headers sent
+        self.sent_header_bytes = {}
+
+    def merge(self, other):
+        """Add the counters of `other` to this shard."""
+        # Copying a dict or list is atomic under the GIL, so a shard can be
+        # read while its owner thread keeps recording.
+        for key, count in dict(other.calls).items():
+            self.calls[key] = self.calls.get(key, 0) + count
+        for method, values in dict(other.latency).items():
+            merged = self.latency.setdefault(method, [0] * (self.bucket_count + 1) + [0.0])
+            for i, value in enumerate(list(values)):
+                merged[i] += value
+        for method, size in dict(other.received_header_bytes).items():
+            self.received_header_bytes[method] = self.received_header_bytes.get(method, 0) + size
+        for method, size in dict(other.sent_header_bytes).items():
+            self.sent_header_bytes[method] = self.sent_header_bytes.get(method, 0) + size
+
+    def clear(self):
+        self.calls.clear()
+        self.latency.clear()
+        self.received_header_bytes.clear()
+        self.sent_header_bytes.clear()
+
+
+class _ShardOwner(object):
+    """Held by a thread's local storage only, so it is freed when the thread ends."""
+
+
+class FlightMetrics(object):
+    """
+    Counters and latency histograms of Flight RPCs, per method and status.
+
+    Every thread records into its own shard, so recording a call takes no
+    lock; shards are merged when the metrics are read. The shard of a thread
+    that has ended is folded into a retired total, so short-lived threads do
+    not pile up shards.
+
+    Parameters
+    ----------
+    buckets : sequence of float, optional
+        Upper bounds of the latency histogram buckets, in seconds.
+    """
+
+    default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(sorted(buckets or self.default_buckets))
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _MetricsShard(len(self.buckets))
+        self._shards_lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _MetricsShard(len(self.buckets))
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.owner = _ShardOwner()
+            weakref.finalize(self._local.owner, self._retire, shard)
+        return shard
+
+    def _retire(self, shard):
+        """Fold the shard of a thread that has ended into the retired total."""
+        with self._shards_lock:
+            self._retired.merge(shard)
+            self._shards.remove(shard)
+
+    def observe(self, method, status, seconds, received_header_bytes=0, sent_header_bytes=0):
+        """Record one completed call."""
+        shard = self._shard()
+        key = (method, status)
+        shard.calls[key] = shard.calls.get(key, 0) + 1
+
+        latency = shard.latency.get(method)
+        if latency is None:
+            latency = shard.latency[method] = [0] * (len(self.buckets) + 1) + [0.0]
+        index = 0
+        while index < len(self.buckets) and seconds > self.buckets[index]:
+            index += 1
+        latency[index] += 1
+        latency[-1] += seconds
+
+        shard.received_header_bytes[method] = shard.received_header_bytes.get(method, 0) + received_header_bytes
+        shard.sent_header_bytes[method] = shard.sent_header_bytes.get(method, 0) + sent_header_bytes
+
+    def snapshot(self):
+        """
+        Return the merged counters as a dict with keys:
+
+        calls : {(method, status): count}
+        latency : {method: {'buckets': [(upper_bound, cumulative_count), ...], 'sum': seconds, 'count': n}}
+        received_header_bytes : {method: bytes}
+        sent_header_bytes : {method: bytes}
+        """
+        merged = _MetricsShard(len(self.buckets))
+        with self._shards_lock:
+            # Taken together, so a shard retired meanwhile is counted once.
+            merged.merge(self._retired)
+            shards = list(self._shards)
+        for shard in shards:
+            merged.merge(shard)
+
+        histograms = {}
+        for method, values in merged.latency.items():
+            cumulative = []
+            total = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values[:-1]):
+                total += count
+                cumulative.append((bound, total))
+            histograms[method] = {'buckets': cumulative, 'sum': values[-1], 'count': total}
+
+        return {'calls': merged.calls, 'latency': histograms, 'received_header_bytes': merged.received_header_bytes,
+                'sent_header_bytes': merged.sent_header_bytes}
+
+    def reset(self):
+        with self._shards_lock:
+            self._retired.clear()
+            for shard in self._shards:
+                shard.clear()
+
+    def render_prometheus(self, prefix='dremio_flight'):
+        """Return the metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = [
+            '# HELP {0}_calls_total Flight RPCs by method and status code.'.format(prefix),
+            '# TYPE {0}_calls_total counter'.format(prefix),
+        ]
+        for (method, status), count in sorted(snapshot['calls'].items()):
+            lines.append('{0}_calls_total{{method="{1}",status="{2}"}} {3}'.format(prefix, method, status, count))
+
+        lines.append('# HELP {0}_call_duration_seconds Flight RPC latency.'.format(prefix))
+        lines.append('# TYPE {0}_call_duration_seconds histogram'.format(prefix))
+        for method, histogram in sorted(snapshot['latency'].items()):
+            for bound, count in histogram['buckets']:
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('{0}_call_duration_seconds_bucket{{method="{1}",le="{2}"}} {3}'.format(
+                    prefix, method, le, count))
+            lines.append('{0}_call_duration_seconds_sum{{method="{1}"}} {2!r}'.format(prefix, method, histogram['sum']))
+            lines.append('{0}_call_duration_seconds_count{{method="{1}"}} {2}'.format(
+                prefix, method, histogram['count']))
+
+        lines.append('# HELP {0}_received_header_bytes_total Bytes of headers and trailers received.'.format(prefix))
+        lines.append('# TYPE {0}_received_header_bytes_total counter'.format(prefix))
+        for method, size in sorted(snapshot['received_header_bytes'].items()):
+            lines.append('{0}_received_header_bytes_total{{method="{1}"}} {2}'.format(prefix, method, size))
+
+        lines.append('# HELP {0}_sent_header_bytes_total Bytes of headers sent.'.format(prefix))
+        lines.append('# TYPE {0}_sent_header_bytes_total counter'.format(prefix))
+        for method, size in sorted(snapshot['sent_header_bytes'].items()):
+            lines.append('{0}_sent_header_bytes_total{{method="{1}"}} {2}'.format(prefix, method, size))
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide metrics recorded by connections opened with EnableMetrics=true.
+flight_metrics = FlightMetrics()
+
+
+class MetricsMiddlewareFactory(ClientMiddlewareFactory):
+    """
+    A factory that creates MetricsMiddleware(s) recording into `metrics`.
+
+    Middleware cannot see the headers of the call options, so the
+    connection sets `headers` to the (name, value) pairs it sends with
+    every call; they are counted as sent by each call. Headers overridden
+    per cursor or statement (see `Connection.call_options`) are not
+    counted: such calls count the connection's headers instead.
+    """
+
+    def __init__(self, metrics=None):
+        self.metrics = metrics if metrics is not None else flight_metrics
+        self.headers = ()
+
+    def start_call(self, info):
+        return MetricsMiddleware(self.metrics, info.method.name.lower(), self.headers)
+
+
+class MetricsMiddleware(ClientMiddleware):
+    """
+    A ClientMiddleware that records the status, latency and sent and
+    received header sizes of a single Flight RPC.
+    Parameters
+    ----------
+    metrics : FlightMetrics
+        The metrics the call is recorded into.
+    method : str
+        The name of the Flight method being called.
+    headers : sequence of (bytes, bytes)
+        The headers of the call options.
+    """
+
+    def __init__(self, metrics, method, headers=()):
+        self.metrics = metrics
+        self.method = method
+        self.headers = headers
+        self.start = time.perf_counter()
+        self.received_header_bytes = 0
+        self.sent_header_bytes = 0
+
+    def sending_headers(self):
+        self.sent_header_bytes += sum(len(name) + len(value) for name, value in self.headers)
+        return {}
+
+    def received_headers(self, headers):
+        self.received_header_bytes += _headers_size(headers)
+
+    def call_completed(self, exception):
+        self.metrics.observe(self.method, _status_code(exception), time.perf_counter() - self.start,
+                             self.received_header_bytes, self.sent_header_bytes)
@@ -0,0 +1,196 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from fnmatch import fnmatchcase
+
+import pyarrow as pa
+from pyarrow import flight
+
+# Flight SQL catalog commands are protobuf messages wrapped in a
+# google.protobuf.Any. They only use string, repeated string and bool fields,
+# so they are encoded by hand rather than pulling in protobuf as a dependency.
+# See: https://arrow.apache.org/docs/format/FlightSql.html
+_TYPE_URL_PREFIX = 'type.googleapis.com/arrow.flight.protocol.sql.'
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _string_field(number, value):
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return _varint(number << 3 | 2) + _varint(len(value)) + value
+
+
+def _bool_field(number, value):
+    return _varint(number << 3) + _varint(1 if value else 0)
+
+
+def _command(name, body=b''):
+    return _string_field(1, _TYPE_URL_PREFIX + name) + _string_field(2, body)
+
+
+def get_db_schemas_command(catalog=None, db_schema_filter_pattern=None):
+    body = b''
+    if catalog is not None:
+        body += _string_field(1, catalog)
+    if db_schema_filter_pattern is not None:
+        body += _string_field(2, db_schema_filter_pattern)
+    return _command('CommandGetDbSchemas', body)
+
+
+def get_tables_command(catalog=None, db_schema_filter_pattern=None, table_name_filter_pattern=None,
+                       table_types=None, include_schema=False):
+    body = b''
+    if catalog is not None:
+        body += _string_field(1, catalog)
+    if db_schema_filter_pattern is not None:
+        body += _string_field(2, db_schema_filter_pattern)
+    if table_name_filter_pattern is not None:
+        body += _string_field(3, table_name_filter_pattern)
+    for table_type in table_types or []:
+        body += _string_field(4, table_type)
+    if include_schema:
+        body += _bool_field(5, True)
+    return _command('CommandGetTables', body)
+
+
+def _glob_to_pattern(glob):
+    """
+    Translate a shell-style glob into a Flight SQL filter pattern. The
+    pattern language has no escape character, so literal `%` and `_` still
+    match as wildcards and results must be re-checked with the glob.
+    """
+    return glob.replace('*', '%').replace('?', '_')
+
+
+def _pushdown_pattern(include):
+    """A Flight SQL filter pattern can express a single include glob only."""
+    if len(include) == 1:
+        return _glob_to_pattern(include[0])
+    return None
+
+
+def _matches(name, include, exclude):
+    if include and not any(fnmatchcase(name, p) for p in include):
+        return False
+    return not any(fnmatchcase(name, p) for p in exclude)
+
+
+def arrow_type_name(t):
+    """Return the Dremio SQL type name for an Arrow type of a table_schema."""
+    if pa.types.is_boolean(t):
+        return 'BOOLEAN'
+    if pa.types.is_int8(t) or pa.types.is_int16(t):
+        return 'smallint'
+    if pa.types.is_int32(t):
+        return 'INTEGER'
+    if pa.types.is_int64(t):
+        return 'BIGINT'
+    if pa.types.is_float32(t):
+        return 'FLOAT'
+    if pa.types.is_floating(t):
+        return 'DOUBLE'
+    if pa.types.is_decimal(t):
+        return 'DECIMAL'
+    if pa.types.is_date(t):
+        return 'DATE'
+    if pa.types.is_time(t):
+        return 'TIME'
+    if pa.types.is_timestamp(t):
+        return 'TIMESTAMP'
+    if pa.types.is_interval(t) or pa.types.is_duration(t):
+        return 'INTERVAL'
+    if pa.types.is_binary(t) or pa.types.is_large_binary(t) or pa.types.is_fixed_size_binary(t):
+        return 'VARBINARY'
+    if pa.types.is_string(t) or pa.types.is_large_string(t):
+        return 'VARCHAR'
+    return 'ANY'
+
+
+class FlightSqlCatalog(object):
+    """
+    Reads catalog metadata through the Flight SQL GetDbSchemas and GetTables
+    commands. These are answered from Dremio's catalog directly and stream
+    back as Arrow, so no SQL job is planned or queued.
+    """
+
+    def __init__(self, flightclient, options=None, default_schema=None):
+        self.flightclient = flightclient
+        self.options = options
+        # The schema context of the connection, for unqualified table names.
+        self.default_schema = default_schema
+
+    def _read(self, command):
+        info = self.flightclient.get_flight_info(flight.FlightDescriptor.for_command(command), self.options)
+        tables = [self.flightclient.do_get(endpoint.ticket, self.options).read_all()
+                  for endpoint in info.endpoints]
+        if not tables:
+            return pa.Table.from_batches([], schema=info.schema)
+        return pa.concat_tables(tables)
+
+    def get_schema_names(self, include=(), exclude=()):
+        table = self._read(get_db_schemas_command(db_schema_filter_pattern=_pushdown_pattern(include)))
+        return [name for name in table.column('db_schema_name').to_pylist()
+                if _matches(name, include, exclude)]
+
+    def get_tables(self, schema=None, table_name=None, include_schemas=(), exclude_schemas=(),
+                   include_tables=(), exclude_tables=(), include_schema=False):
+        """
+        Return `(db_schema_name, table_name, table_schema)` tuples. An explicit
+        `schema`/`table_name` must match exactly; otherwise the glob filters
+        apply. `table_schema` is a `pyarrow.Schema` when `include_schema` is
+        set and None otherwise.
+        """
+        command = get_tables_command(
+            db_schema_filter_pattern=schema if schema is not None else _pushdown_pattern(include_schemas),
+            table_name_filter_pattern=table_name if table_name is not None else _pushdown_pattern(include_tables),
+            include_schema=include_schema)
+        table = self._read(command)
+
+        schemas = table.column('db_schema_name').to_pylist()
+        names = table.column('table_name').to_pylist()
+        if include_schema:
+            table_schemas = table.column('table_schema').to_pylist()
+        else:
+            table_schemas = [None] * len(names)
+
+        # Compare literally when an explicit name was given, since `_` in it
+        # is a wildcard for the server.
+        def keep(value, exact, include, exclude):
+            if exact is not None:
+                return value == exact
+            return _matches(value, include, exclude)
+
+        result = []
+        for db_schema, name, serialized in zip(schemas, names, table_schemas):
+            if not keep(db_schema or '', schema, include_schemas, exclude_schemas):
+                continue
+            if not keep(name, table_name, include_tables, exclude_tables):
+                continue
+            if serialized is not None:
+                serialized = pa.ipc.read_schema(pa.py_buffer(serialized))
+            result.append((db_schema, name, serialized))
+        return result
+
+
+def is_unsupported(error):
+    """
+    Whether `error` from a Flight SQL command means the server lacks Flight
+    SQL: it answered UNIMPLEMENTED. Other errors may be one-off failures.
+    """
+    return isinstance(error, NotImplementedError)
+
+
+CATALOG_ERRORS = (flight.FlightError, pa.ArrowNotImplementedError)
@@ -0,0 +1,229 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datetime
+import decimal
+import math
+import re
+from collections.abc import Mapping
+from functools import lru_cache
+
+from sqlalchemy_dremio.exceptions import ProgrammingError
+
+# Dremio does not support parameterized statements, so bound values are
+# rendered into the statement text as SQL literals on the client.
+
+# Regions where a `?` is not a placeholder: string literals, quoted
+# identifiers and comments. Each alternative consumes the whole region so the
+# scan never looks inside it.
+_QMARK_TOKENS = re.compile(r"""
+      '(?:[^']|'')*'
+    | "(?:[^"]|"")*"
+    | --[^\n]*
+    | /\*.*?\*/
+    | \?
+""", re.S | re.X)
+
+# pyformat placeholders: %(name)s, positional %s and the %% escape.
+_PYFORMAT_TOKENS = re.compile(r'%(?:\((?P<name>[^)]*)\)s|(?P<positional>s)|%)')
+
+# Plans of statements up to this many characters are cached. The cache keeps
+# its statements alive, and longer ones, e.g. with large literal lists, are
+# rarely run twice.
+_MAX_CACHED_STATEMENT = 4096
+
+
+def _render_string(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _render_float(value):
+    if math.isnan(value):
+        return "CAST('NaN' AS DOUBLE)"
+    if math.isinf(value):
+        return "CAST('{0}Infinity' AS DOUBLE)".format('' if value > 0 else '-')
+    return repr(value)
+
+
+def _render_decimal(value):
+    if not value.is_finite():
+        raise ProgrammingError('Cannot render non-finite decimal {0!r}'.format(value))
+    return format(value, 'f')
+
+
+def _render_datetime(value):
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    # Dremio timestamps have millisecond precision.
+    return "TIMESTAMP '{0}.{1:03d}'".format(value.strftime('%Y-%m-%d %H:%M:%S'), value.microsecond // 1000)
+
+
+def _render_date(value):
+    return "DATE '{0}'".format(value.isoformat())
+
+
+def _render_time(value):
+    return "TIME '{0}.{1:03d}'".format(value.strftime('%H:%M:%S'), value.microsecond // 1000)
+
+
+def _render_binary(value):
+    return "X'{0}'".format(bytes(value).hex())
+
+
+class InList(tuple):
+    """
+    The values of a large IN list bound as one parameter, rendered as a
+    comma-separated list of literals. A read-only statement with one runs
+    once per `chunk_size` values; see `split_in_lists`. Duplicates are
+    dropped, keeping the first of each, as a value in two chunks would
+    match its rows twice.
+    """
+
+    def __new__(cls, values, chunk_size):
+        self = super(InList, cls).__new__(cls, dict.fromkeys(values))
+        self.chunk_size = chunk_size
+        return self
+
+
+def split_in_lists(parameters):
+    """
+    Return the parameters to run a statement with: one mapping per chunk of
+    the first InList of `parameters` longer than its chunk size, or just
+    `parameters`.
+    """
+    if isinstance(parameters, Mapping):
+        for key, value in parameters.items():
+            if isinstance(value, InList) and len(value) > value.chunk_size:
+                size = value.chunk_size
+                chunks = []
+                for start in range(0, len(value), size):
+                    chunk = dict(parameters)
+                    chunk[key] = InList(value[start:start + size], size)
+                    chunks.append(chunk)
+                return chunks
+    return [parameters]
+
+
+_renderers = {
+    type(None): lambda value: 'NULL',
+    bool: lambda value: 'TRUE' if value else 'FALSE',
+    int: str,
+    float: _render_float,
+    decimal.Decimal: _render_decimal,
+    str: _render_string,
+    datetime.datetime: _render_datetime,
+    datetime.date: _render_date,
+    datetime.time: _render_time,
+    bytes: _render_binary,
+    bytearray: _render_binary,
+    memoryview: _render_binary,
+    InList: lambda value: ', '.join(map(render_literal, value)),
+}
+
+
+def _find_renderer(value_type):
+    # Subclasses (e.g. IntEnum, pandas.Timestamp) render like their closest
+    # base; anything else is rendered as a quoted string.
+    for base in value_type.__mro__:
+        if base in _renderers:
+            return _renderers[base]
+    return lambda value: _render_string(str(value))
+
+
+def render_literal(value):
+    """Render a Python value as a Dremio SQL literal."""
+    render = _renderers.get(type(value))
+    if render is None:
+        render = _renderers[type(value)] = _find_renderer(type(value))
+    return render(value)
+
+
+@lru_cache(maxsize=256)
+def _qmark_plan(statement):
+    """
+    Split `statement` around its `?` placeholders in a single scan. Returns
+    the text chunks between placeholders, one more than there are
+    placeholders.
+    """
+    chunks = []
+    start = 0
+    for match in _QMARK_TOKENS.finditer(statement):
+        if match.group() == '?':
+            chunks.append(statement[start:match.start()])
+            start = match.end()
+    chunks.append(statement[start:])
+    return tuple(chunks)
+
+
+def render_qmark(statement, parameters):
+    """Inline positional `parameters` into the `?` placeholders of `statement`."""
+    if not parameters:
+        return statement
+
+    plan = _qmark_plan if len(statement) <= _MAX_CACHED_STATEMENT else _qmark_plan.__wrapped__
+    chunks = plan(statement)
+    if len(chunks) - 1 != len(parameters):
+        raise ProgrammingError('Statement has {0} placeholders but {1} parameters were supplied'.format(
+            len(chunks) - 1, len(parameters)))
+
+    out = [chunks[0]]
+    for value, chunk in zip(parameters, chunks[1:]):
+        out.append(render_literal(value))
+        out.append(chunk)
+    return ''.join(out)
+
+
+@lru_cache(maxsize=256)
+def _pyformat_plan(statement, named):
+    """
+    Precompute how bound values are spliced into a pyformat `statement`.
+    Returns `(chunks, keys)`: the text between placeholders with `%%`
+    unescaped, and the parameter key (name, or position when not `named`)
+    of each placeholder. Placeholders of the other style are left as text.
+    """
+    chunks = []
+    keys = []
+    text = []
+    start = 0
+    for match in _PYFORMAT_TOKENS.finditer(statement):
+        name, positional = match.group('name'), match.group('positional')
+        if name is None and positional is None:
+            text.append(statement[start:match.start()] + '%')
+        elif named == (name is not None):
+            text.append(statement[start:match.start()])
+            chunks.append(''.join(text))
+            text = []
+            keys.append(name if named else len(keys))
+        else:
+            text.append(statement[start:match.end()])
+        start = match.end()
+    text.append(statement[start:])
+    chunks.append(''.join(text))
+    return tuple(chunks), tuple(keys)
+
+
+def render_pyformat(statement, parameters):
+    """
+    Inline `parameters` into a pyformat `statement`: a mapping fills
+    `%(name)s` placeholders, a sequence fills `%s` placeholders.
+    """
+    if '%' not in statement:
+        # No placeholders or escapes: nothing to plan.
+        return statement
+    plan = _pyformat_plan if len(statement) <= _MAX_CACHED_STATEMENT else _pyformat_plan.__wrapped__
+    chunks, keys = plan(statement, isinstance(parameters, Mapping))
+    if not keys:
+        return chunks[0]
+
+    try:
+        values = [render_literal(parameters[key]) for key in keys]
+    except (KeyError, IndexError) as e:
+        raise ProgrammingError('No value supplied for placeholder {0}'.format(e))
+
+    out = [chunks[0]]
+    for value, chunk in zip(values, chunks[1:]):
+        out.append(value)
+        out.append(chunk)
+    return ''.join(out)
@@ -3,63 +3,432 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
 from sqlalchemy import types
 
 import pyarrow as pa
 from pyarrow import flight
 
-# We're converting Arrow to a Pandas dataframe below, so we need to cover all supported pandas data types here. 
-# See: https://arrow.apache.org/docs/python/pandas.html#arrow-pandas-conversion
-# TODO (LJ): If we remove the conversion to pandas df we can switch to using native arrow types.
-_type_map = {
-    'bool': types.Boolean(),
-    'int8': types.SmallInteger(),
-    'byte': types.SmallInteger(),
-    'int16': types.Integer(),
-    'int32': types.Integer(),
-    'int64': types.BigInteger(),
-    'float32': types.Float(precision=32),
-    'float64': types.Float(precision=64),
-    'string': types.String(),
-    'object': types.String(),
-    'datetime64[ns]': types.DATETIME,
-
-    # GH-33321: https://github.com/apache/arrow/pull/35656 - Support converting to non-nano datetime64 for pandas >= 2.0 
-    'datetime64[ms]': types.DATETIME,
-    'datetime64[s]': types.DATETIME,
-    'datetime64[us]': types.DATETIME,
-
-    #TODO (LJ): Handle unsigned integers?
-    #TODO (LJ): Handle timestamp with timezone?
-}
-
-def run_query(query, flightclient=None, options=None):
-    info = flightclient.get_flight_info(flight.FlightDescriptor.for_command(query), options)
-    reader = flightclient.do_get(info.endpoints[0].ticket, options)
-
-    batches = []
+from sqlalchemy_dremio.exceptions import OperationalError
+from sqlalchemy_dremio.rows import DEFAULT_DICTIONARY_THRESHOLD, table_rows
+
+def _sqla_type(arrow_type):
+    """Return the SQLAlchemy type describing result columns of `arrow_type`."""
+    t = arrow_type
+    if pa.types.is_dictionary(t):
+        return _sqla_type(t.value_type)
+    if pa.types.is_boolean(t):
+        return types.Boolean()
+    if pa.types.is_int8(t) or pa.types.is_uint8(t):
+        return types.SmallInteger()
+    if pa.types.is_int16(t) or pa.types.is_int32(t) or pa.types.is_uint16(t):
+        return types.Integer()
+    if pa.types.is_integer(t):
+        return types.BigInteger()
+    if pa.types.is_float32(t):
+        return types.Float(precision=32)
+    if pa.types.is_floating(t):
+        return types.Float(precision=64)
+    if pa.types.is_decimal(t):
+        return types.Numeric(precision=t.precision, scale=t.scale)
+    if pa.types.is_timestamp(t):
+        return types.DateTime(timezone=t.tz is not None)
+    if pa.types.is_date(t):
+        return types.Date()
+    if pa.types.is_time(t):
+        return types.Time()
+    if pa.types.is_interval(t) or pa.types.is_duration(t):
+        return types.Interval()
+    if pa.types.is_binary(t) or pa.types.is_large_binary(t) or pa.types.is_fixed_size_binary(t):
+        return types.LargeBinary()
+    if pa.types.is_string(t) or pa.types.is_large_string(t):
+        return types.String()
+    # Lists, structs and maps come back as Python lists and dicts.
+    return types.NullType()
+
+
+# Per-query statistics are logged here at DEBUG level, with the values also
+# attached to the record as `dremio_stats` for structured log handlers.
+stats_logger = logging.getLogger('sqlalchemy_dremio.stats')
+
+
+def _elapsed_ms(start):
+    return (time.perf_counter() - start) * 1000.0
+
+
+class QueryStats(object):
+    """
+    Client-side timings and volumes of a single query.
+
+    flight_info_ms : time for `get_flight_info`, i.e. Dremio planning and queueing
+    first_batch_ms : time from the `do_get` call to the first record batch
+    do_get_ms : time from the `do_get` call to the end of the stream
+    convert_ms : time spent converting the Arrow data to Python rows
+    total_ms : end-to-end time of the query
+    batches, rows : number of record batches and rows received
+    bytes : Arrow buffer size of the received batches
+    retries : number of `get_flight_info` and `do_get` calls retried
+    hedged : whether a second `get_flight_info` was sent
+    hedge_won : whether the second `get_flight_info` answered first
+    queued_ms : time waiting for admission, when queries are admission controlled
+    pool_bytes, pool_peak_bytes : bytes allocated from the query's Arrow memory
+        pool once the result is read, and the most allocated at once
+    """
+
+    __slots__ = ('flight_info_ms', 'first_batch_ms', 'do_get_ms', 'convert_ms', 'total_ms',
+                 'batches', 'rows', 'bytes', 'retries', 'hedged', 'hedge_won', 'queued_ms',
+                 'pool_bytes', 'pool_peak_bytes')
+
+    def __init__(self):
+        self.flight_info_ms = None
+        self.first_batch_ms = None
+        self.do_get_ms = None
+        self.convert_ms = None
+        self.total_ms = None
+        self.batches = 0
+        self.rows = 0
+        self.bytes = 0
+        self.retries = 0
+        self.hedged = False
+        self.hedge_won = False
+        self.queued_ms = None
+        self.pool_bytes = None
+        self.pool_peak_bytes = None
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return 'QueryStats({0})'.format(', '.join(
+            '{0}={1!r}'.format(name, getattr(self, name)) for name in self.__slots__))
+
+
+# Failures worth retrying: the server or the network was briefly unavailable.
+RETRYABLE_ERRORS = (flight.FlightUnavailableError, flight.FlightTimedOutError)
+
+# Statements that only read, so running them again is harmless. Leading
+# comments and parentheses are skipped.
+_READ_ONLY = re.compile(r'^(?:\s+|--[^\n]*|/\*.*?\*/|\()*(?:SELECT|WITH|VALUES|SHOW|DESCRIBE|EXPLAIN)\b',
+                        re.I | re.S)
+
+
+def is_read_only(query):
+    """Return whether `query` is a read-only statement that is safe to retry."""
+    return _READ_ONLY.match(query) is not None
+
+
+class RetryPolicy(object):
+    """
+    How a cursor retries and hedges read-only queries.
+
+    max_retries : retries of each failed `get_flight_info` or `do_get` call
+    backoff_ms, max_backoff_ms : a retry waits a random time of up to
+        backoff_ms * 2 ** attempt, capped at max_backoff_ms ("full jitter")
+    hedge_after_ms : when set, a second `get_flight_info` is sent if the
+        first has not answered after this long, and the first answer wins
+    """
+
+    __slots__ = ('max_retries', 'backoff_ms', 'max_backoff_ms', 'hedge_after_ms')
+
+    def __init__(self, max_retries=0, backoff_ms=100, max_backoff_ms=5000, hedge_after_ms=None):
+        self.max_retries = max_retries
+        self.backoff_ms = backoff_ms
+        self.max_backoff_ms = max_backoff_ms
+        self.hedge_after_ms = hedge_after_ms
+
+    def backoff(self, attempt):
+        """Return the seconds to wait before retry number `attempt` (from 0)."""
+        return random.uniform(0, min(self.max_backoff_ms, self.backoff_ms * 2 ** attempt)) / 1000.0
+
+
+class ResultLimit(object):
+    """
+    Caps on the size of a result, checked as its streams are read. Passing
+    one cancels the streams, and with them the Dremio job, and raises
+    OperationalError.
+
+    max_bytes : Arrow buffer size of the received batches
+    max_rows : rows received
+    """
+
+    __slots__ = ('max_bytes', 'max_rows', 'bytes', 'rows', '_lock')
+
+    def __init__(self, max_bytes=None, max_rows=None):
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self.bytes = 0
+        self.rows = 0
+        # Endpoints may be read concurrently.
+        self._lock = threading.Lock()
+
+    def add(self, batch):
+        """Count a received record batch, raising OperationalError if a cap is passed."""
+        with self._lock:
+            self.rows += batch.num_rows
+            self.bytes += batch.nbytes
+            rows, nbytes = self.rows, self.bytes
+        if self.max_rows is not None and rows > self.max_rows:
+            raise OperationalError('The result exceeds max_result_rows={0}; the query was cancelled'.format(
+                self.max_rows))
+        if self.max_bytes is not None and nbytes > self.max_bytes:
+            raise OperationalError('The result exceeds max_result_bytes={0}; the query was cancelled'.format(
+                self.max_bytes))
+
+    def remove(self, rows, nbytes):
+        """Uncount the batches of a stream read again from its start."""
+        with self._lock:
+            self.rows -= rows
+            self.bytes -= nbytes
+
+
+def _retrying(call, policy):
+    """
+    Return `(call(), retries)`, retrying transient failures as `policy`
+    allows. With no policy the call is made once.
+    """
+    attempt = 0
     while True:
         try:
-            batch, metadata = reader.read_chunk()
-            batches.append(batch)
-        except StopIteration:
-            break
+            return call(), attempt
+        except RETRYABLE_ERRORS:
+            if policy is None or attempt >= policy.max_retries:
+                raise
+            time.sleep(policy.backoff(attempt))
+            attempt += 1
+
+
+def _in_thread(fn, *args):
+    """Run `fn(*args)` on a new daemon thread, returning a Future of its result."""
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+def _get_flight_info(flightclient, hedge_client, descriptor, options, policy, stats):
+    if policy is None or policy.hedge_after_ms is None:
+        return flightclient.get_flight_info(descriptor, options)
+
+    first = _in_thread(flightclient.get_flight_info, descriptor, options)
+    done, _ = wait([first], timeout=policy.hedge_after_ms / 1000.0)
+    if done:
+        return first.result()
+
+    # The slower call cannot be cancelled; its answer is dropped.
+    stats.hedged = True
+    second = _in_thread(hedge_client.get_flight_info, descriptor, options)
+    pending = {first, second}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                stats.hedge_won = future is second
+                return future.result()
+            error = error or future.exception()
+    raise error
+
+
+def _read_endpoint(flightclient, ticket, options, start, policy=None, limit=None):
+    """
+    Read the stream of one endpoint, starting over if it fails part way.
+    Returns its schema, its batches, the milliseconds from `start` to its
+    first batch and the number of retries. The batches are counted against
+    the ResultLimit `limit`.
+    """
+    first_batch_ms = []
+
+    def read():
+        reader = flightclient.do_get(ticket, options)
+        batches = []
+        try:
+            while True:
+                try:
+                    batch, metadata = reader.read_chunk()
+                except StopIteration:
+                    break
+                if not first_batch_ms:
+                    first_batch_ms.append(_elapsed_ms(start))
+                batches.append(batch)
+                if limit is not None:
+                    limit.add(batch)
+        except OperationalError:
+            reader.cancel()
+            raise
+        except Exception:
+            # A retried stream is counted again from its start.
+            if limit is not None:
+                limit.remove(sum(batch.num_rows for batch in batches), sum(batch.nbytes for batch in batches))
+            raise
+        return reader.schema, batches
+
+    (schema, batches), retries = _retrying(read, policy)
+    return schema, batches, first_batch_ms[0] if first_batch_ms else None, retries
+
+
+def retry_policy_for(query, retry_policy):
+    """Return `retry_policy` if `query` may be retried, i.e. only reads, else None."""
+    return retry_policy if retry_policy is not None and is_read_only(query) else None
+
+
+def get_flight_info(query, flightclient, options, stats, policy=None, hedge_client=None):
+    """Submit `query`, retrying and hedging `get_flight_info` as `policy` allows."""
+    start = time.perf_counter()
+    descriptor = flight.FlightDescriptor.for_command(query)
+    info, stats.retries = _retrying(
+        lambda: _get_flight_info(flightclient, hedge_client or flightclient, descriptor, options, policy, stats),
+        policy)
+    stats.flight_info_ms = _elapsed_ms(start)
+    return info
+
+
+class ChunkedFlightInfo(object):
+    """The endpoints of the FlightInfos of a statement's chunks, read in order as one result."""
+
+    __slots__ = ('schema', 'endpoints')
+
+    def __init__(self, schema, endpoints):
+        self.schema = schema
+        self.endpoints = endpoints
+
+
+def get_chunked_flight_info(queries, flightclient, options, stats, policy=None, hedge_client=None, admitted=None):
+    """
+    Submit the chunks `queries` of a statement concurrently, as
+    `get_flight_info` does each. Returns a ChunkedFlightInfo.
+
+    Each chunk is a Dremio job of its own, so with `admitted` each is
+    submitted inside `admitted(chunk_stats)`, a context manager holding an
+    admission slot and setting the `queued_ms` of the chunk's QueryStats.
+    """
+    def submit(query, query_stats):
+        if admitted is None:
+            return get_flight_info(query, flightclient, options, query_stats, policy, hedge_client)
+        with admitted(query_stats):
+            return get_flight_info(query, flightclient, options, query_stats, policy, hedge_client)
+
+    start = time.perf_counter()
+    chunk_stats = [QueryStats() for _ in queries]
+    with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+        infos = list(pool.map(submit, queries, chunk_stats))
+    stats.flight_info_ms = _elapsed_ms(start)
+    queued = [s.queued_ms for s in chunk_stats if s.queued_ms is not None]
+    if queued:
+        stats.queued_ms = max(queued)
+    stats.retries = sum(s.retries for s in chunk_stats)
+    stats.hedged = any(s.hedged for s in chunk_stats)
+    stats.hedge_won = any(s.hedge_won for s in chunk_stats)
+    return ChunkedFlightInfo(infos[0].schema, [endpoint for info in infos for endpoint in info.endpoints])
+
+
+def read_table(info, flightclient, options, stats, data_clients=None, policy=None, limit=None):
+    """Read all the endpoints of `info` into a pa.Table, within the ResultLimit `limit`."""
+    # The result may be split over several endpoints. With several channels
+    # their streams are spread round-robin over them and read concurrently;
+    # either way the batches are kept in endpoint order.
+    clients = data_clients or [flightclient]
+    tickets = [(clients[i % len(clients)], endpoint.ticket) for i, endpoint in enumerate(info.endpoints)]
+    start = time.perf_counter()
+    if len(clients) > 1 and len(tickets) > 1:
+        with ThreadPoolExecutor(max_workers=min(len(clients), len(tickets))) as pool:
+            futures = [pool.submit(_read_endpoint, client, ticket, options, start, policy, limit)
+                       for client, ticket in tickets]
+            results = [future.result() for future in futures]
+    else:
+        results = [_read_endpoint(client, ticket, options, start, policy, limit) for client, ticket in tickets]
+    stats.do_get_ms = _elapsed_ms(start)
+
+    batches = [batch for _, endpoint_batches, _, _ in results for batch in endpoint_batches]
+    first_batches = [first for _, _, first, _ in results if first is not None]
+    stats.retries += sum(retries for _, _, _, retries in results)
+    stats.first_batch_ms = min(first_batches) if first_batches else None
+    stats.batches = len(batches)
+    stats.rows = sum(batch.num_rows for batch in batches)
+    stats.bytes = sum(batch.nbytes for batch in batches)
+
+    return pa.Table.from_batches(batches, schema=results[0][0] if results else info.schema)
+
+
+def stream_batches(info, flightclient, options, stats, on_close=None, limit=None, data_clients=None):
+    """
+    Return the Arrow schema of the result of `info` and an iterator over its
+    record batches. The endpoints are read one after the other as the
+    iterator is consumed, so only the current batch is held in memory; with
+    `data_clients`, their streams are spread round-robin over them.
+    `on_close` is called once the iterator is exhausted or closed; closing
+    it early cancels the stream being read. The batches are counted against
+    the ResultLimit `limit`.
+
+    Streams are not retried: batches already handed out cannot be taken
+    back if a stream breaks.
+    """
+    start = time.perf_counter()
+    clients = data_clients or [flightclient]
+    readers = (clients[i % len(clients)].do_get(endpoint.ticket, options) for i, endpoint in enumerate(info.endpoints))
+    try:
+        first_reader = next(readers, None)
+    except Exception:
+        if on_close is not None:
+            on_close()
+        raise
+    schema = first_reader.schema if first_reader is not None else info.schema
+
+    def batches():
+        reader = first_reader
+        try:
+            while reader is not None:
+                while True:
+                    try:
+                        batch, metadata = reader.read_chunk()
+                    except StopIteration:
+                        break
+                    if stats.first_batch_ms is None:
+                        stats.first_batch_ms = _elapsed_ms(start)
+                    stats.batches += 1
+                    stats.rows += batch.num_rows
+                    stats.bytes += batch.nbytes
+                    if limit is not None:
+                        limit.add(batch)
+                    yield batch
+                reader = next(readers, None)
+        finally:
+            # Closed before the end: the server stops sending the stream.
+            if reader is not None:
+                reader.cancel()
+            stats.do_get_ms = _elapsed_ms(start)
+            if on_close is not None:
+                on_close()
+
+    return schema, batches()
 
-    data = pa.Table.from_batches(batches)
-    
-    # TODO (LJ): Remove conversion to pandas dataframe?
-    df = data.to_pandas(date_as_object=False)
 
-    return df
+def describe(schema):
+    """Return the DB-API description of a result with the Arrow `schema`."""
+    return [(field.name, _sqla_type(field.type), None, None, field.nullable) for field in schema]
 
 
-def execute(query, flightclient=None, options=None):
-    df = run_query(query, flightclient, options)
+def to_rows(table, stats, decoding='column', dictionary_threshold=DEFAULT_DICTIONARY_THRESHOLD, conversion=None,
+            memory_pool=None):
+    """Return the rows of a pa.Table, which decode cells as they are read; see `rows.table_rows`."""
+    start = time.perf_counter()
+    rows = table_rows(table, decoding, dictionary_threshold, conversion, memory_pool)
+    stats.convert_ms = (stats.convert_ms or 0.0) + _elapsed_ms(start)
+    return rows
 
-    result = []
 
-    for x, y in df.dtypes.to_dict().items():
-        o = (x, _type_map[str(y.name)], None, None, True)
-        result.append(o)
+def log_stats(stats):
+    if stats_logger.isEnabledFor(logging.DEBUG):
+        stats_logger.debug('Query statistics: %r', stats, extra={'dremio_stats': stats.as_dict()})
 
-    return df.values.tolist(), result
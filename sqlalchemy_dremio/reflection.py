@@ -0,0 +1,111 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, Future, wait
+
+from sqlalchemy import Column, Table, inspect, pool
+
+logger = logging.getLogger(__name__)
+
+
+def _get_table_names(engine, schema):
+    with engine.connect() as connection:
+        return inspect(connection).get_table_names(schema=schema)
+
+
+def _get_columns(engine, table_name, schema):
+    with engine.connect() as connection:
+        return inspect(connection).get_columns(table_name, schema=schema)
+
+
+class _InlineExecutor(object):
+    """An executor running each call in the calling thread as it is submitted."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+def reflect_concurrently(engine, metadata, schemas=None, max_workers=4):
+    """
+    Reflect the tables of several schemas into `metadata` using a bounded
+    thread pool.
+
+    `get_table_names` is issued for every schema and, as each schema
+    completes, `get_columns` is issued for its tables, so the calls of
+    different schemas overlap instead of running one after another over a
+    single connection. Every worker checks out its own pooled connection.
+
+    Parameters
+    ----------
+    engine : sqlalchemy.engine.Engine
+        A `dremio+flight` engine.
+    metadata : sqlalchemy.MetaData
+        The collection the reflected `Table` objects are added to.
+    schemas : list of str, optional
+        The schemas to reflect. Defaults to every schema reported by
+        `get_schema_names`.
+    max_workers : int
+        The maximum number of reflection calls in flight at once.
+
+    Returns
+    -------
+    list of sqlalchemy.Table
+        The reflected tables, ordered by schema and table name.
+    """
+    if schemas is None:
+        with engine.connect() as connection:
+            schemas = inspect(connection).get_schema_names()
+
+    # SingletonThreadPool closes an arbitrary connection, possibly one in use,
+    # once more than pool_size threads hold one. The calling thread already
+    # holds one, so the workers may take the others; with none left, the
+    # calls run in the calling thread.
+    if isinstance(engine.pool, pool.SingletonThreadPool):
+        max_workers = min(max_workers, engine.pool.size - 1)
+
+    columns = {}
+    with ThreadPoolExecutor(max_workers=max_workers) if max_workers >= 1 else _InlineExecutor() as executor:
+        pending = {}
+        for schema in schemas:
+            pending[executor.submit(_get_table_names, engine, schema)] = (schema, None)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                schema, table_name = pending.pop(future)
+                if table_name is None:
+                    for name in future.result():
+                        pending[executor.submit(_get_columns, engine, name, schema)] = (schema, name)
+                else:
+                    columns[(schema, table_name)] = future.result()
+
+    logger.debug('Reflected %d tables from %d schemas', len(columns), len(schemas))
+
+    # MetaData is not thread-safe, so the Table objects are built here rather
+    # than in the workers.
+    tables = []
+    for (schema, table_name) in sorted(columns, key=lambda key: (key[0] or '', key[1])):
+        key = table_name if not schema else '{0}.{1}'.format(schema, table_name)
+        if key in metadata.tables:
+            tables.append(metadata.tables[key])
+            continue
+        table_columns = [
+            Column(c['name'], c['type'], nullable=c['nullable'], comment=c['comment'])
+            for c in columns[(schema, table_name)]
+        ]
+        tables.append(Table(table_name, metadata, *table_columns, schema=schema or None))
+    return tables
@@ -0,0 +1,198 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import sys
+from operator import itemgetter
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from sqlalchemy_dremio.conversion import binary_views
+from sqlalchemy_dremio.exceptions import NotSupportedError
+
+DECODINGS = ('column', 'cell')
+
+# String and binary columns with at most this fraction of distinct values
+# are decoded through a dictionary, sharing one object per distinct value.
+DEFAULT_DICTIONARY_THRESHOLD = 0.5
+
+# Values sampled to guess a column's cardinality before encoding it whole.
+_DICTIONARY_SAMPLE = 4096
+
+
+def _decode_dictionary(array, memory_pool=None):
+    """Decode a DictionaryArray with one Python object, interned if a str, per distinct value."""
+    values = array.dictionary.to_pylist()
+    if pa.types.is_string(array.type.value_type) or pa.types.is_large_string(array.type.value_type):
+        values = [sys.intern(value) if value is not None else None for value in values]
+    # Null indices point past the dictionary, at None; widened first, as the
+    # index past a full int8 or int16 dictionary does not fit its type.
+    values.append(None)
+    indices = pc.cast(array.indices, pa.int64(), memory_pool=memory_pool)
+    indices = pc.coalesce(indices, pa.scalar(len(values) - 1, pa.int64()), memory_pool=memory_pool)
+    return list(map(values.__getitem__, indices.to_pylist()))
+
+
+def decode(array, dictionary_threshold=DEFAULT_DICTIONARY_THRESHOLD, binary='bytes', memory_pool=None):
+    """
+    Convert a pa.Array to a list of Python values. Dictionary-encoded arrays
+    decode each distinct value once. Other string and binary arrays with at
+    most `dictionary_threshold` distinct values per row, estimated from a
+    sample, are dictionary-encoded first; 0 turns this off. With `binary`
+    'memoryview', binary values are views of the Arrow data buffer. Arrow
+    memory is allocated from `memory_pool`.
+    """
+    t = array.type
+    if binary == 'memoryview' and (pa.types.is_binary(t) or pa.types.is_large_binary(t)):
+        return binary_views(array)
+    if pa.types.is_dictionary(t):
+        return _decode_dictionary(array, memory_pool)
+    if dictionary_threshold and len(array) > 1 and (
+            pa.types.is_string(t) or pa.types.is_large_string(t) or pa.types.is_binary(t)
+            or pa.types.is_large_binary(t)):
+        sample = array.slice(0, _DICTIONARY_SAMPLE)
+        if pc.count_distinct(sample, memory_pool=memory_pool).as_py() <= dictionary_threshold * len(sample):
+            encoded = pc.dictionary_encode(array, memory_pool=memory_pool)
+            if len(encoded.dictionary) <= dictionary_threshold * len(array):
+                return _decode_dictionary(encoded, memory_pool)
+    return array.to_pylist()
+
+
+class _Batch(object):
+    """
+    The columns of a record batch, shared by its rows, and the Python values
+    of the columns decoded so far.
+    """
+
+    __slots__ = ('columns', 'values', 'complete', 'dictionary_threshold', 'binary', 'memory_pool')
+
+    def __init__(self, columns, dictionary_threshold=DEFAULT_DICTIONARY_THRESHOLD, binary='bytes', memory_pool=None):
+        # Fetching a column of a batch builds a new pa.Array, so it is done once.
+        self.columns = columns
+        self.values = [None] * len(columns)
+        self.complete = not columns
+        self.dictionary_threshold = dictionary_threshold
+        self.binary = binary
+        self.memory_pool = memory_pool
+
+    def column(self, i):
+        """Return the Python values of column `i`, decoding it on first use."""
+        values = self.values[i]
+        if values is None:
+            values = self.values[i] = decode(self.columns[i], self.dictionary_threshold, self.binary,
+                                             self.memory_pool)
+        return values
+
+    def all(self):
+        """Return the Python values of every column, decoding those not used yet."""
+        if not self.complete:
+            for i in range(len(self.columns)):
+                self.column(i)
+            self.complete = True
+        return self.values
+
+
+class Row(object):
+    """
+    A result row that refers to its record batch and its index in it. The
+    first time a column of the batch is read, from any of its rows, the
+    whole column is converted to Python values and kept with the batch;
+    columns never read are never converted.
+
+    Rows behave as read-only sequences: they support `len`, indexing, slicing
+    and iteration, and compare equal to tuples and lists of the same values.
+    A row keeps its whole record batch alive.
+    """
+
+    __slots__ = ('_batch', '_index')
+
+    def __init__(self, batch, index):
+        self._batch = batch
+        self._index = index
+
+    def __len__(self):
+        return len(self._batch.columns)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return tuple(self[i] for i in range(*key.indices(len(self))))
+        return self._batch.column(key)[self._index]
+
+    def __iter__(self):
+        # Reading a whole row reads every column of the batch.
+        return map(itemgetter(self._index), self._batch.all())
+
+    def __eq__(self, other):
+        if isinstance(other, (Row, tuple, list)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return repr(tuple(self))
+
+    def __reduce__(self):
+        # Pickled as the plain tuple of its values, without the batch.
+        return tuple, (tuple(self),)
+
+
+def _cell(column, index, binary='bytes'):
+    """Convert one value of a pa.Array; with `binary` 'memoryview', as `decode` does."""
+    if binary == 'memoryview' and (pa.types.is_binary(column.type) or pa.types.is_large_binary(column.type)):
+        # A scalar's buffer is a copy; a slice of the array shares its data.
+        return binary_views(column.slice(index, 1))[0]
+    return column[index].as_py()
+
+
+class CellRow(Row):
+    """
+    A Row that converts each cell as it is read and keeps nothing, for
+    results whose rows are read only once or only in part.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return tuple(self[i] for i in range(*key.indices(len(self))))
+        return _cell(self._batch.columns[key], self._index, self._batch.binary)
+
+    def __iter__(self):
+        index, binary = self._index, self._batch.binary
+        for column in self._batch.columns:
+            yield _cell(column, index, binary)
+
+
+def check_decoding(decoding):
+    if decoding not in DECODINGS:
+        raise NotSupportedError('Unsupported decoding {0!r}, use one of {1}'.format(decoding, ', '.join(DECODINGS)))
+
+
+def table_rows(table, decoding='column', dictionary_threshold=DEFAULT_DICTIONARY_THRESHOLD, conversion=None,
+               memory_pool=None):
+    """
+    Return a row for each row of the pa.Table `table`, in order. With the
+    'column' decoding rows are Row objects, which decode and keep a column of
+    their batch on first use (see `decode`); with 'cell' they are CellRow
+    objects. The columns are first cast as the ConversionPolicy `conversion`
+    says. Casts and decoding allocate Arrow memory from `memory_pool`.
+    """
+    check_decoding(decoding)
+    row_class = CellRow if decoding == 'cell' else Row
+    binary = 'bytes'
+    if conversion is not None:
+        table = conversion.convert(table, memory_pool)
+        binary = conversion.binary
+    rows = []
+    for batch in table.to_batches():
+        shared = _Batch(batch.columns, dictionary_threshold, binary, memory_pool)
+        rows.extend(row_class(shared, i) for i in range(batch.num_rows))
+    return rows